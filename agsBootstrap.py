@@ -0,0 +1,133 @@
+"""
+############################################################################
+Copyright (c) 2024 - 2025 Dell Inc. All rights reserved.
+This software and associated documentation (if any) is furnished
+under a license and may only be used or copied in accordance
+with the terms of the license. Except as permitted by such
+license, no part of this software or documentation may be
+reproduced, stored in a retrieval system, or transmitted in any
+form or by any means without the express written consent of
+Dell Inc.
+############################################################################
+"""
+############################################################################
+## Includes
+############################################################################
+import os
+import sys
+import time
+import inspect
+import importlib
+import threading
+
+import setupTrace
+from envSetup import BASE_BUILDTOOLS_PATH
+
+############################################################################
+## Variables
+############################################################################
+AGS_SCRIPT_URL = "ssh://git@miller.amer.dell.com/cdc/ags_scripts.git"
+AGS_SCRIPT_BRANCH = "main"
+AGS_SCRIPTS_DIR = os.path.join(BASE_BUILDTOOLS_PATH, "DevTools", "ags_scripts")
+
+# A checkout fetched less than this long ago is used as is; 0 fetches on every run
+AGS_FETCH_TTL_SECONDS = int(os.getenv("SETUP_AGS_FETCH_TTL", default=3600))
+# Touched in the checkout's .git directory after every clone or successful update
+AGS_UPDATE_STAMP = "setup-last-update"
+
+_bootstrapLock = threading.Lock()
+_bootstrapped = False
+
+############################################################################
+## Class Implementation
+############################################################################
+
+#
+# @brief     AgsModule
+# @details   Stand-in for a module from ags_scripts (or one of the workspace modules importing it).
+#            The first attribute access brings ags_scripts up to date and imports the module,
+#            so commands that never use it start without any git or network work.
+#
+class AgsModule:
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr: str):
+        if self._module is None:
+            EnsureAgsScripts()
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+############################################################################
+## Function Implementation
+############################################################################
+
+def runGit(args: list, cwd: str = None) -> int:
+    print(f"git {' '.join(args)}")
+    sys.stdout.flush()
+    return setupTrace.run(["git"] + args, cwd=cwd).returncode
+
+#
+# @brief     lastUpdateAge
+# @details   Seconds since ags_scripts was last brought up to date, None if never (or not by this
+#            script). FETCH_HEAD is not used: a fetch whose fast-forward fails rewrites it as well.
+#
+def lastUpdateAge(scriptsDir: str):
+    stampPath = os.path.join(scriptsDir, ".git", AGS_UPDATE_STAMP)
+    if os.path.exists(stampPath):
+        return time.time() - os.path.getmtime(stampPath)
+    return None
+
+
+def recordUpdate(scriptsDir: str) -> None:
+    with open(os.path.join(scriptsDir, ".git", AGS_UPDATE_STAMP), "w") as stampFd:
+        stampFd.write(f"{time.time()}\n")
+
+#
+# @brief     cloneUpdateAgSScripts
+# @details   Clone ags_scripts, or update it with a single fetch when the last one is older
+#            than AGS_FETCH_TTL_SECONDS. An update that fails (e.g. offline, or local commits
+#            that block the fast-forward) keeps the local checkout and is tried again on the
+#            next run; only a failed clone is fatal.
+#
+@setupTrace.traced()
+def cloneUpdateAgSScripts(scriptsDir: str = AGS_SCRIPTS_DIR) -> None:
+    funcName = inspect.currentframe().f_code.co_name + '()'
+
+    if not os.path.exists(scriptsDir):
+        os.makedirs(name=os.path.dirname(scriptsDir), exist_ok=True)
+        retVal = runGit(["clone", "--branch", AGS_SCRIPT_BRANCH, AGS_SCRIPT_URL, scriptsDir])
+        if retVal != 0:
+            print(f"Cloning Ags-Scripts failed with, returncode={retVal}, bailing out...")
+            sys.exit(1)
+        recordUpdate(scriptsDir)
+        print(f"{funcName}: Ags-Scripts cloned successfully...")
+        return
+
+    age = lastUpdateAge(scriptsDir)
+    if age is not None and age < AGS_FETCH_TTL_SECONDS:
+        print(f"{funcName}: Ags-Scripts updated {int(age)}s ago, not updating (SETUP_AGS_FETCH_TTL={AGS_FETCH_TTL_SECONDS})")
+        return
+
+    retVal = runGit(["fetch", "origin", AGS_SCRIPT_BRANCH], scriptsDir)
+    if retVal == 0:
+        retVal = runGit(["checkout", "-q", AGS_SCRIPT_BRANCH], scriptsDir)
+    if retVal == 0:
+        retVal = runGit(["merge", "-q", "--ff-only", "FETCH_HEAD"], scriptsDir)
+    if retVal != 0:
+        print(f"{funcName}: Updating Ags-Scripts failed with, returncode={retVal}, using the local checkout...")
+        return
+    recordUpdate(scriptsDir)
+    print(f"{funcName}: Ags-Scripts updated successfully...")
+
+#
+# @brief     EnsureAgsScripts
+# @details   Clone or update ags_scripts once per process
+#
+def EnsureAgsScripts() -> None:
+    global _bootstrapped
+    with _bootstrapLock:
+        if not _bootstrapped:
+            cloneUpdateAgSScripts()
+            _bootstrapped = True
@@ -0,0 +1,343 @@
+"""
+############################################################################
+Copyright (c) 2024 - 2025 Dell Inc. All rights reserved.
+This software and associated documentation (if any) is furnished
+under a license and may only be used or copied in accordance
+with the terms of the license. Except as permitted by such
+license, no part of this software or documentation may be
+reproduced, stored in a retrieval system, or transmitted in any
+form or by any means without the express written consent of
+Dell Inc.
+############################################################################
+"""
+############################################################################
+## Includes
+############################################################################
+import os
+import json
+import stat
+import time
+import shutil
+import hashlib
+import platform
+import threading
+from typing import Callable, Optional
+
+if platform.system() == "Windows":
+    import msvcrt
+else:
+    import fcntl
+
+############################################################################
+## Variables
+############################################################################
+# Machine-wide cache shared by every workspace on the agent
+ARTIFACT_CACHE_DIR = os.getenv("SETUP_ARTIFACT_CACHE_DIR",
+                               default=os.path.join(os.getenv("BUILDTOOLS_PATH_OVERRIDE", default=""), ".artifact_cache"))
+# Extracted trees are evicted least recently used first beyond this size
+ARTIFACT_CACHE_MAX_GB = float(os.getenv("SETUP_ARTIFACT_CACHE_MAX_GB", default=64))
+
+MANIFEST_NAME = "manifest.json"
+
+############################################################################
+## Class Implementation
+############################################################################
+
+#
+# @brief     FileLock
+# @details   Exclusive lock on a file, held across processes (flock / msvcrt.locking) and
+#            across threads of one process. acquire() and release() may run on different threads.
+#
+class FileLock:
+    def __init__(self, path: str):
+        self.path = path
+        self.lockFd = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        lockFd = open(self.path, "a+")
+        while True:
+            try:
+                if platform.system() == "Windows":
+                    lockFd.seek(0)
+                    msvcrt.locking(lockFd.fileno(), msvcrt.LK_NBLCK, 1)
+                else:
+                    fcntl.flock(lockFd.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except OSError:
+                if not blocking:
+                    lockFd.close()
+                    return False
+                time.sleep(0.2)
+        self.lockFd = lockFd
+        return True
+
+    def release(self) -> None:
+        lockFd, self.lockFd = self.lockFd, None
+        if lockFd is None:
+            return
+        if platform.system() == "Windows":
+            lockFd.seek(0)
+            msvcrt.locking(lockFd.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(lockFd.fileno(), fcntl.LOCK_UN)
+        lockFd.close()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *excInfo):
+        self.release()
+
+
+#
+# @brief     ArtifactCache
+# @details   Content-addressed store of extracted tool archives.
+#
+#            objects/<sha256>/   extracted tree of the archive with that sha256, files read-only
+#            manifest.json       artifact URL (which names the version) -> sha256, ETag, size,
+#                                tree stamp, last use
+#            locks/              one lock per artifact URL, plus the manifest lock
+#
+#            Workspaces get the tree through hardlinks (a copy where linking is not possible),
+#            so N checkouts cost the disk space of one. A hardlink shares the file, so the cached
+#            files are made read-only: a tool writing into its own directory fails instead of
+#            changing the cache and every other workspace. A tree that changed anyway no longer
+#            matches its stamp and is dropped on lookup. An evicted tree stays alive in the
+#            workspaces still linking to it.
+#
+class ArtifactCache:
+    def __init__(self, root: str = ARTIFACT_CACHE_DIR, maxBytes: Optional[int] = None):
+        self.root = root
+        self.maxBytes = int(ARTIFACT_CACHE_MAX_GB * (1 << 30)) if maxBytes is None else maxBytes
+        self.objectsDir = os.path.join(root, "objects")
+        self.manifestPath = os.path.join(root, MANIFEST_NAME)
+        self._threadLock = threading.Lock()
+        os.makedirs(self.objectsDir, exist_ok=True)
+
+    def _manifestLock(self) -> FileLock:
+        return FileLock(os.path.join(self.root, "locks", "manifest.lock"))
+
+    def entryLock(self, url: str) -> FileLock:
+        """Lock held while one artifact is downloaded and stored, so it is only fetched once."""
+        return FileLock(os.path.join(self.root, "locks", hashlib.sha1(url.encode()).hexdigest() + ".lock"))
+
+    def _readManifest(self) -> dict:
+        try:
+            with open(self.manifestPath, "r") as manifestFd:
+                return json.load(manifestFd)
+        except (OSError, ValueError):
+            return {"entries": {}}
+
+    def _writeManifest(self, manifest: dict) -> None:
+        tmpPath = f"{self.manifestPath}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmpPath, "w") as manifestFd:
+            json.dump(manifest, manifestFd, indent=1, sort_keys=True)
+        os.replace(tmpPath, self.manifestPath)
+
+    def _updateManifest(self, update: Callable[[dict], None]) -> dict:
+        with self._threadLock, self._manifestLock():
+            manifest = self._readManifest()
+            update(manifest)
+            self._writeManifest(manifest)
+            return manifest
+
+    def contains(self, url: str) -> bool:
+        """Whether url has an entry, read without the manifest lock (lookup decides)."""
+        return url in self._readManifest()["entries"]
+
+    #
+    # @brief     lookup
+    # @details   Extracted tree cached for url, or None. Marks the entry as used.
+    #            With the sha256 (or else the ETag) the server currently reports for url, an entry
+    #            stored from different content is stale and not returned. A tree that no longer
+    #            matches the stamp taken when it was stored is damaged: it is removed, with every
+    #            entry pointing at it, so the next store extracts it again.
+    #
+    def lookup(self, url: str, sha256: Optional[str] = None, etag: Optional[str] = None) -> Optional[str]:
+        entry = self._readManifest()["entries"].get(url)
+        if entry is None:
+            return None
+        # Walking the tree can take a while; done outside the manifest lock
+        stampedSha256 = entry["sha256"]
+        stamp = treeStamp(os.path.join(self.objectsDir, stampedSha256))
+        found = []
+        damaged = []
+
+        def touch(manifest: dict) -> None:
+            entry = manifest["entries"].get(url)
+            if entry is None:
+                return
+            objectDir = os.path.join(self.objectsDir, entry["sha256"])
+            if not os.path.isdir(objectDir):
+                del manifest["entries"][url]
+                return
+            if entry["sha256"] != stampedSha256:
+                return  # stored again meanwhile; not the tree that was checked
+            if entry.get("stamp") != stamp:
+                for other in [key for key, value in manifest["entries"].items() if value["sha256"] == entry["sha256"]]:
+                    del manifest["entries"][other]
+                damagedDir = f"{objectDir}.{os.getpid()}.{threading.get_ident()}.damaged"
+                os.replace(objectDir, damagedDir)
+                damaged.append(damagedDir)
+                return
+            if sha256 and entry["sha256"] != sha256.strip().lower():
+                return
+            if not sha256 and etag and entry.get("etag") != etag:
+                return
+            entry["lastUsed"] = time.time()
+            found.append(objectDir)
+
+        self._updateManifest(touch)
+        for damagedDir in damaged:
+            print(f"Artifact cache: {url} was modified in place, dropped")
+            removeTree(damagedDir)
+        return found[0] if found else None
+
+    #
+    # @brief     store
+    # @details   Add the archive downloaded for url. extract(dir) unpacks it into dir; it is skipped
+    #            when an archive with the same sha256 is already cached, unless refresh is set
+    #            (--force: the cached tree may have been damaged). Returns the extracted tree.
+    #
+    def store(self, url: str, archivePath: str, extract: Callable[[str], None], refresh: bool = False,
+              etag: Optional[str] = None) -> str:
+        digest = hashlib.sha256()
+        with open(archivePath, "rb") as archiveFd:
+            for block in iter(lambda: archiveFd.read(1 << 20), b""):
+                digest.update(block)
+        sha256 = digest.hexdigest()
+        objectDir = os.path.join(self.objectsDir, sha256)
+
+        if refresh or not os.path.isdir(objectDir):
+            stagingDir = f"{objectDir}.{os.getpid()}.{threading.get_ident()}.tmp"
+            removeTree(stagingDir)
+            extract(stagingDir)
+            makeReadOnly(stagingDir)
+            if refresh and os.path.isdir(objectDir):
+                # Workspaces linking to the old files keep them; the cache gets the fresh tree
+                oldDir = f"{objectDir}.{os.getpid()}.{threading.get_ident()}.old"
+                os.replace(objectDir, oldDir)
+                removeTree(oldDir)
+            try:
+                os.replace(stagingDir, objectDir)
+            except OSError:
+                # Same content stored meanwhile under another URL
+                removeTree(stagingDir)
+
+        size = treeSize(objectDir)
+        stamp = treeStamp(objectDir)
+
+        def register(manifest: dict) -> None:
+            now = time.time()
+            manifest["entries"][url] = {"sha256": sha256, "etag": etag, "size": size, "stamp": stamp,
+                                        "created": now, "lastUsed": now}
+
+        self._updateManifest(register)
+        self.collectGarbage(keep=url)
+        return objectDir
+
+    #
+    # @brief     collectGarbage
+    # @details   Evict least recently used entries until the cache fits maxBytes. Trees shared by
+    #            several URLs are counted and removed once. Returns the number of bytes freed.
+    #
+    def collectGarbage(self, keep: Optional[str] = None) -> int:
+        removed = []
+        held = []
+
+        def evict(manifest: dict) -> None:
+            entries = manifest["entries"]
+            sizes = {entry["sha256"]: entry["size"] for entry in entries.values()}
+            total = sum(sizes.values())
+            for url, entry in sorted(entries.items(), key=lambda item: item[1]["lastUsed"]):
+                if total <= self.maxBytes:
+                    break
+                # Entries being linked into a workspace right now are left alone
+                lock = self.entryLock(url)
+                if url == keep or not lock.acquire(blocking=False):
+                    continue
+                held.append(lock)
+                del entries[url]
+                if not any(other["sha256"] == entry["sha256"] for other in entries.values()):
+                    total -= sizes[entry["sha256"]]
+                    removed.append(entry)
+
+        try:
+            self._updateManifest(evict)
+            for entry in removed:
+                removeTree(os.path.join(self.objectsDir, entry["sha256"]))
+        finally:
+            for lock in held:
+                lock.release()
+        return sum(entry["size"] for entry in removed)
+
+    #
+    # @brief     materialize
+    # @details   Make outDir a hardlinked copy of a cached tree; built next to outDir and moved
+    #            in place so a half linked tool never shows up under its final name. The files
+    #            under outDir are read-only, like the cached ones they link to.
+    #
+    def materialize(self, objectDir: str, outDir: str) -> None:
+        stagingDir = outDir + ".linking"
+        removeTree(stagingDir)
+        linkTree(objectDir, stagingDir)
+        removeTree(outDir)
+        os.replace(stagingDir, outDir)
+
+############################################################################
+## Function Implementation
+############################################################################
+
+def linkTree(srcDir: str, dstDir: str) -> None:
+    for root, dirs, files in os.walk(srcDir):
+        targetDir = os.path.join(dstDir, os.path.relpath(root, srcDir))
+        os.makedirs(targetDir, exist_ok=True)
+        for fileName in files:
+            srcPath = os.path.join(root, fileName)
+            dstPath = os.path.join(targetDir, fileName)
+            try:
+                os.link(srcPath, dstPath)
+            except OSError:
+                # Another volume, or a file system without hardlinks
+                shutil.copy2(srcPath, dstPath)
+
+
+def treeSize(path: str) -> int:
+    return sum(os.lstat(os.path.join(root, fileName)).st_size
+               for root, _, files in os.walk(path) for fileName in files)
+
+
+def treeStamp(path: str) -> str:
+    """sha256 over the relative path, size and mtime of every file under path."""
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for fileName in sorted(files):
+            filePath = os.path.join(root, fileName)
+            fileStat = os.lstat(filePath)
+            digest.update(f"{os.path.relpath(filePath, path)}\0{fileStat.st_size}\0{fileStat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def makeReadOnly(path: str) -> None:
+    writeBits = stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+    for root, _, files in os.walk(path):
+        for fileName in files:
+            filePath = os.path.join(root, fileName)
+            if not os.path.islink(filePath):
+                os.chmod(filePath, os.lstat(filePath).st_mode & ~writeBits)
+
+
+def removeTree(path: str) -> None:
+    """shutil.rmtree that also removes read-only files (Windows refuses to delete those)."""
+    def makeWritable(function, failedPath, excInfo):
+        try:
+            os.chmod(failedPath, stat.S_IWRITE | stat.S_IREAD)
+            function(failedPath)
+        except OSError:
+            pass
+
+    if os.path.lexists(path):
+        shutil.rmtree(path, onerror=makeWritable)
@@ -0,0 +1,362 @@
+"""
+############################################################################
+Copyright (c) 2024 - 2025 Dell Inc. All rights reserved.
+This software and associated documentation (if any) is furnished
+under a license and may only be used or copied in accordance
+with the terms of the license. Except as permitted by such
+license, no part of this software or documentation may be
+reproduced, stored in a retrieval system, or transmitted in any
+form or by any means without the express written consent of
+Dell Inc.
+############################################################################
+"""
+############################################################################
+## Includes
+############################################################################
+import os
+import sys
+import time
+import shutil
+import random
+import hashlib
+import netrc
+import base64
+import platform
+import subprocess
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import setupTrace
+from artifactCache import removeTree
+
+############################################################################
+## Variables
+############################################################################
+# Archives fetched at once; extraction runs on its own smaller pool
+DOWNLOAD_WORKERS = int(os.getenv("SETUP_DOWNLOAD_WORKERS", default=4))
+EXTRACT_WORKERS = int(os.getenv("SETUP_EXTRACT_WORKERS", default=2))
+# Attempts per archive; the wait doubles after every failed attempt
+DOWNLOAD_ATTEMPTS = 4
+BACKOFF_SECONDS = 2.0
+CHUNK_SIZE = 1 << 20
+SOCKET_TIMEOUT = 60
+
+# Artifactory returns the checksum of the stored artifact in this header
+CHECKSUM_HEADER = "X-Checksum-Sha256"
+
+# HTTP statuses worth another attempt; any other error fails the archive right away
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+_printLock = threading.Lock()
+
+############################################################################
+## Class Implementation
+############################################################################
+
+#
+# @brief     DownloadJob
+# @details   One archive to fetch and unpack, with the outcome of the attempt
+#
+class DownloadJob:
+    def __init__(self, group: str, name: str, url: str, outDir: str, sha256: Optional[str] = None):
+        self.group = group
+        self.name = name
+        self.url = url
+        self.outDir = outDir
+        self.sha256 = sha256
+        self.etag = None
+        self.status = "pending"
+        self.error = None
+        self.attempts = 0
+        self.bytes = 0
+        self.resumedFrom = 0
+        self.downloadSeconds = 0.0
+        self.extractSeconds = 0.0
+
+
+class PermanentError(Exception):
+    pass
+
+############################################################################
+## Function Implementation
+############################################################################
+
+def log(message: str) -> None:
+    with _printLock:
+        print(message)
+        sys.stdout.flush()
+
+#
+# @brief     netrcAuthHeader
+# @details   Basic auth header for the host of url from the .netrc written by credSupport.CreateNetrc
+#
+def netrcAuthHeader(url: str) -> Optional[str]:
+    netrcPath = os.path.join(os.path.expanduser("~"), "_netrc" if platform.system() == "Windows" else ".netrc")
+    if not os.path.exists(netrcPath):
+        return None
+    try:
+        auth = netrc.netrc(netrcPath).authenticators(urllib.parse.urlparse(url).hostname)
+    except (netrc.NetrcParseError, OSError):
+        return None
+    if auth is None:
+        return None
+    login, _, password = auth
+    return "Basic " + base64.b64encode(f"{login}:{password}".encode()).decode()
+
+
+def authorizedRequest(url: str, method: str = "GET") -> urllib.request.Request:
+    request = urllib.request.Request(url, method=method)
+    authHeader = netrcAuthHeader(url)
+    if authHeader:
+        request.add_header("Authorization", authHeader)
+    return request
+
+#
+# @brief     remoteStamp
+# @details   sha256 and ETag the server reports for url (HEAD request), None where it reports
+#            nothing or cannot be reached
+#
+def remoteStamp(url: str) -> Tuple[Optional[str], Optional[str]]:
+    try:
+        with urllib.request.urlopen(authorizedRequest(url, "HEAD"), timeout=SOCKET_TIMEOUT) as response:
+            return response.headers.get(CHECKSUM_HEADER), response.headers.get("ETag")
+    except (urllib.error.URLError, OSError):
+        return None, None
+
+
+def fileSha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as partFd:
+        for block in iter(lambda: partFd.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+#
+# @brief     downloadFile
+# @details   Fetch url into partPath, continuing a partial file with an HTTP Range request.
+#            The finished file is checked against sha256, or against the checksum the server
+#            reports when the config has none. Returns the size of the file.
+#
+def downloadFile(job: DownloadJob, partPath: str) -> int:
+    offset = os.path.getsize(partPath) if os.path.exists(partPath) else 0
+    request = authorizedRequest(job.url)
+    if offset:
+        request.add_header("Range", f"bytes={offset}-")
+
+    try:
+        response = urllib.request.urlopen(request, timeout=SOCKET_TIMEOUT)
+    except urllib.error.HTTPError as e:
+        if e.code == 416 and offset:
+            # Nothing left to fetch: the partial file is already complete
+            expected = job.sha256 or e.headers.get(CHECKSUM_HEADER)
+            job.etag = e.headers.get("ETag")
+            verifyChecksum(partPath, expected)
+            return offset
+        if e.code in RETRY_STATUS:
+            raise
+        raise PermanentError(f"HTTP {e.code} {e.reason} for {job.url}")
+
+    with response:
+        if offset and response.status == 206:
+            job.resumedFrom = offset
+            mode = "ab"
+        else:
+            # Server ignored the range; start over
+            mode = "wb"
+        expected = job.sha256 or response.headers.get(CHECKSUM_HEADER)
+        job.etag = response.headers.get("ETag")
+        length = response.headers.get("Content-Length")
+        with open(partPath, mode) as partFd:
+            for block in iter(lambda: response.read(CHUNK_SIZE), b""):
+                partFd.write(block)
+                job.bytes += len(block)
+
+    # A dropped connection can end the body early without an error; keep the partial file to resume
+    size = os.path.getsize(partPath)
+    if length is not None and size < (offset if mode == "ab" else 0) + int(length):
+        raise ConnectionError(f"connection closed after {size} bytes")
+    verifyChecksum(partPath, expected)
+    return os.path.getsize(partPath)
+
+
+def verifyChecksum(path: str, expected: Optional[str]) -> None:
+    if not expected:
+        return
+    actual = fileSha256(path)
+    if actual.lower() != expected.strip().lower():
+        # A corrupt partial file must not be resumed
+        os.remove(path)
+        raise ValueError(f"sha256 mismatch for {os.path.basename(path)}: expected {expected}, got {actual}")
+
+#
+# @brief     fetchWithRetry
+# @details   downloadFile with exponential backoff between attempts. Transient network
+#            errors and checksum mismatches are retried; 4xx responses are not.
+#
+def fetchWithRetry(job: DownloadJob, partPath: str) -> None:
+    for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+        job.attempts = attempt
+        try:
+            downloadFile(job, partPath)
+            return
+        except PermanentError:
+            raise
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            if attempt == DOWNLOAD_ATTEMPTS:
+                raise
+            delay = BACKOFF_SECONDS * (2 ** (attempt - 1)) * (1 + random.random() / 2)
+            log(f"{job.name}: attempt {attempt} failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+#
+# @brief     extractArchive
+# @details   Unpack a .7z next to outDir, then move it in place so a half extracted
+#            tool never shows up under its final name
+#
+def extractArchive(archivePath: str, outDir: str, sevenZip: str = "7z") -> None:
+    stagingDir = outDir + ".extracting"
+    shutil.rmtree(stagingDir, ignore_errors=True)
+    result = setupTrace.run([sevenZip, "x", "-y", f"-o{stagingDir}", archivePath],
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    if result.returncode != 0:
+        shutil.rmtree(stagingDir, ignore_errors=True)
+        raise RuntimeError(f"7z failed with returncode={result.returncode}: {result.stdout.strip()[-500:]}")
+    # outDir may hold read-only files linked from the artifact cache by an earlier run
+    removeTree(outDir)
+    os.makedirs(os.path.dirname(outDir), exist_ok=True)
+    os.replace(stagingDir, outDir)
+
+#
+# @brief     RunDownloads
+# @details   Download every job on a bounded thread pool and hand each finished archive to
+#            the extraction pool, so unpacking overlaps with the downloads still running.
+#            A failed job never stops the others. Returns the jobs with their status.
+#
+# @param jobs        DownloadJob list
+# @param downloadDir Where archives and partial downloads are kept between runs
+# @param Override    True: download and extract again even if the output directory exists,
+#                    without using the cache, which gets the fresh download
+# @param cache       Optional ArtifactCache: cached tools still matching the configured sha256, or
+#                    the checksum / ETag the server reports, are linked in instead of downloaded;
+#                    new downloads are added to it
+#
+def RunDownloads(jobs: List[DownloadJob], downloadDir: str, Override: bool = False,
+                 workers: int = DOWNLOAD_WORKERS, extractWorkers: int = EXTRACT_WORKERS,
+                 sevenZip: Optional[str] = None, cache=None) -> List[DownloadJob]:
+    sevenZip = sevenZip or shutil.which("7z") or shutil.which("7za") or "7z"
+    os.makedirs(downloadDir, exist_ok=True)
+
+    def extract(job: DownloadJob, archivePath: str, entryLock) -> None:
+        with setupTrace.span(f"extract {job.name}", "download", group=job.group) as traceArgs:
+            extractJob(job, archivePath, entryLock)
+            traceArgs["status"] = job.status
+
+    def extractJob(job: DownloadJob, archivePath: str, entryLock) -> None:
+        started = time.perf_counter()
+        try:
+            if cache is not None:
+                objectDir = cache.store(job.url, archivePath,
+                                        lambda stagingDir: extractArchive(archivePath, stagingDir, sevenZip),
+                                        refresh=Override, etag=job.etag)
+                cache.materialize(objectDir, job.outDir)
+            else:
+                extractArchive(archivePath, job.outDir, sevenZip)
+            os.remove(archivePath)
+            job.status = "done"
+            log(f"{job.name}: extracted to {job.outDir}")
+        except Exception as e:
+            job.status = "failed"
+            job.error = f"extract: {e}"
+        finally:
+            if entryLock is not None:
+                entryLock.release()
+        job.extractSeconds = time.perf_counter() - started
+
+    def linkCached(job: DownloadJob) -> bool:
+        if not cache.contains(job.url):
+            return False
+        # Only link what the server would send now: a replaced artifact under the same URL is fetched again
+        sha256, etag = (job.sha256, None) if job.sha256 else remoteStamp(job.url)
+        objectDir = cache.lookup(job.url, sha256, etag)
+        if objectDir is None:
+            return False
+        started = time.perf_counter()
+        cache.materialize(objectDir, job.outDir)
+        job.extractSeconds = time.perf_counter() - started
+        job.status = "cached"
+        log(f"{job.name}: linked from the artifact cache to {job.outDir}")
+        return True
+
+    def fetch(job: DownloadJob, extractPool: ThreadPoolExecutor):
+        if os.path.exists(job.outDir) and not Override:
+            job.status = "skipped"
+            return None
+        entryLock = None
+        if cache is not None:
+            # Held until the archive is stored, so concurrent setups fetch a tool only once
+            entryLock = cache.entryLock(job.url)
+            entryLock.acquire()
+            try:
+                if not Override and linkCached(job):
+                    entryLock.release()
+                    return None
+            except Exception as e:
+                entryLock.release()
+                job.status = "failed"
+                job.error = f"cache: {e}"
+                return None
+        fileName = f"{job.group}-{job.name}-{os.path.basename(urllib.parse.urlparse(job.url).path)}"
+        archivePath = os.path.join(downloadDir, fileName)
+        partPath = archivePath + ".part"
+        started = time.perf_counter()
+        with setupTrace.span(f"download {job.name}", "download", group=job.group, url=job.url) as traceArgs:
+            try:
+                fetchWithRetry(job, partPath)
+                os.replace(partPath, archivePath)
+            except Exception as e:
+                if entryLock is not None:
+                    entryLock.release()
+                job.status = "failed"
+                job.error = f"download: {e}"
+                return None
+            finally:
+                job.downloadSeconds = time.perf_counter() - started
+                throughput = job.bytes / (1 << 20) / job.downloadSeconds if job.downloadSeconds else 0.0
+                traceArgs.update(bytes=job.bytes, resumedFrom=job.resumedFrom, attempts=job.attempts,
+                                 mbPerSecond=round(throughput, 2), failed=job.status == "failed")
+                setupTrace.counter("download MB/s", **{job.name: round(throughput, 2)})
+        log(f"{job.name}: downloaded {job.bytes / (1 << 20):.1f} MB in {job.downloadSeconds:.1f}s")
+        job.status = "extracting"
+        return extractPool.submit(extract, job, archivePath, entryLock)
+
+    with ThreadPoolExecutor(max_workers=extractWorkers, thread_name_prefix="extract") as extractPool:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="download") as downloadPool:
+            fetches = [downloadPool.submit(fetch, job, extractPool) for job in jobs]
+            extracts = [future.result() for future in fetches]
+        for future in extracts:
+            if future is not None:
+                future.result()
+    if cache is not None:
+        cache.collectGarbage()
+    return jobs
+
+#
+# @brief     PrintDownloadSummary
+# @details   One line per job and every failure with its reason. Returns True if nothing failed.
+#
+def PrintDownloadSummary(jobs: List[DownloadJob]) -> bool:
+    failed = [job for job in jobs if job.status == "failed"]
+    log("Download summary:")
+    for job in jobs:
+        resumed = f", resumed at {job.resumedFrom} bytes" if job.resumedFrom else ""
+        log(f"  [{job.status:>7}] {job.group}/{job.name}: {job.bytes / (1 << 20):.1f} MB, "
+            f"download {job.downloadSeconds:.1f}s, extract {job.extractSeconds:.1f}s, "
+            f"{job.attempts} attempt(s){resumed}")
+    for job in failed:
+        log(f"  FAILED {job.group}/{job.name} ({job.url}): {job.error}")
+    log(f"{len(jobs) - len(failed)}/{len(jobs)} downloads succeeded")
+    return not failed
@@ -26,17 +26,13 @@ PROJECT_ID = "ags_2025"
 
 WORKSPACE_ROOT = os.getenv('WORKSPACE_ROOT', default=Path(__file__).resolve().parent)
 ROOT_BUILD = os.path.join(WORKSPACE_ROOT, 'Build')
-if not os.path.exists(ROOT_BUILD):
-    print(f'Creating: {ROOT_BUILD}')
-    os.makedirs(ROOT_BUILD)
-    os.environ['ROOT_BUILD'] = ROOT_BUILD
 WS_ENV_VAR_PATH = os.path.join(ROOT_BUILD, 'envVars.json')
 
 ############################################################################
 ## Function Implementation
 ############################################################################
 #
-# Initialize sys path
+# Initialize sys path (no file system or network access, so importing this module is free)
 #
 
 def InitializeSysPath():
@@ -47,12 +43,7 @@ def InitializeSysPath():
         else:
             buildToolsPath = os.path.join('/', 'bea', 'BuildTools')
         os.environ["BUILDTOOLS_PATH_OVERRIDE"] = buildToolsPath
-    os.makedirs(name = buildToolsPath, exist_ok = True)
-    if not os.path.exists(buildToolsPath):
-        raise Exception(f"{buildToolsPath} does not exist. Exiting ...")
-        sys.exit(1)
 
-    
     # delltoolsPath = os.path.join(WORKSPACE_ROOT, 'DellPkgs','BuildTools', 'DellTools')
 
     # print(f"buildToolsPath: {buildToolsPath}")
@@ -61,18 +52,30 @@ def InitializeSysPath():
     sys.path.insert(0, os.path.join(buildToolsPath, "DevTools", "ags_scripts", "python"))
     return buildToolsPath
 
+#
+# Create the BuildTools and Build directories, called by the commands that use them
+#
+
+def InitializeWorkspaceDirs():
+    os.makedirs(name = BASE_BUILDTOOLS_PATH, exist_ok = True)
+    if not os.path.exists(BASE_BUILDTOOLS_PATH):
+        raise Exception(f"{BASE_BUILDTOOLS_PATH} does not exist. Exiting ...")
+        sys.exit(1)
+    if not os.path.exists(ROOT_BUILD):
+        print(f'Creating: {ROOT_BUILD}')
+        os.makedirs(ROOT_BUILD)
+        os.environ['ROOT_BUILD'] = ROOT_BUILD
+
+    print(f"BASE_BUILDTOOLS_PATH    : {BASE_BUILDTOOLS_PATH}")
+    print(f"PROJECT_ID              : {PROJECT_ID}")
+    print(f"WORKSPACE_ROOT          : {WORKSPACE_ROOT}")
+    print(f"ROOT_BUILD              : {ROOT_BUILD}")
+    print(f"WS_ENV_VAR_PATH         : {WS_ENV_VAR_PATH}")
+
 ############################################################################
 ## Variables
 ############################################################################
 # Calling to Initialize the environment
 BASE_BUILDTOOLS_PATH = InitializeSysPath()
 
-#
-# 
-#
-print(f"BASE_BUILDTOOLS_PATH    : {BASE_BUILDTOOLS_PATH}")
-print(f"PROJECT_ID              : {PROJECT_ID}")
-print(f"WORKSPACE_ROOT          : {WORKSPACE_ROOT}")
-print(f"ROOT_BUILD              : {ROOT_BUILD}")
-print(f"WS_ENV_VAR_PATH         : {WS_ENV_VAR_PATH}")
 # print(f"sys.path: {sys.path}")
\ No newline at end of file
@@ -0,0 +1,86 @@
+import numpy as np
+
+from route_engine import compute_weights, assign_trucks, line_errors, consolidate_loads
+from route_distance import get_distance_matrix
+from route_metrics import stage
+from route_vrp import plan_routes, known_destinations, DEFAULT_TIME_BUDGET_MS
+
+# Optimization modes and the response key their results go under
+MODES = {
+    "routes": "optimized_routes",
+    "consolidate": "loads",
+    "multistop": "routes",
+}
+
+
+def run_batch(mode, frame, ref, time_budget_ms=DEFAULT_TIME_BUDGET_MS):
+    """
+    Run one optimization mode over an order frame against the given
+    reference data. Returns (items, errors, stats); stats is only set for
+    the multistop solver.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode: {mode}")
+    with stage("weights"):
+        weights, valid = compute_weights(frame, ref.item_weights)
+    stats = None
+
+    if mode == "routes":
+        with stage("truck_selection"):
+            items, truck_pos = assign_trucks(frame, weights, valid, ref.truck_index)
+        return items, line_errors(frame, valid, ref.item_weights, truck_pos), stats
+
+    known = np.ones(len(frame), dtype=bool)
+    if mode == "consolidate":
+        with stage("consolidation"):
+            items, unassigned = consolidate_loads(frame, weights, valid, ref.truck_index)
+    else:
+        with stage("vrp_solve"):
+            distances = get_distance_matrix()
+            known = known_destinations(frame, distances)
+            items, unassigned, stats = plan_routes(frame, weights, valid & known, ref.truck_index, distances,
+                                                   time_budget_ms)
+
+    truck_pos = np.zeros(len(weights), dtype=np.int64)
+    truck_pos[unassigned] = -1
+    errors = line_errors(frame, valid, ref.item_weights, truck_pos)
+    errors += [{"line": int(line), "Destination": frame["Destination"].iat[line], "error": "Unknown Destination"}
+               for line in np.flatnonzero(valid & ~known)]
+    return items, sorted(errors, key=lambda error: error["line"]), stats
+
+
+def batch_response(mode, items, errors, stats=None):
+    """Response body for a mode, in the layout of its endpoint."""
+    response = {MODES[mode]: items}
+    if mode != "routes":
+        response["trucks_dispatched"] = len(items)
+    if mode == "multistop":
+        response["total_distance_km"] = round(sum(item["Distance (km)"] for item in items), 1)
+        response["solver"] = stats or {}
+    if errors:
+        response["errors"] = errors
+    return response
+
+
+def destination_region(destination):
+    """State (or country) part of a destination, e.g. "Baton Rouge, LA" -> "LA"."""
+    return str(destination).replace(",", " ").split()[-1] if str(destination).strip() else ""
+
+
+def split_by_region(frame, parts):
+    """
+    Split order lines into at most parts groups of whole destination regions,
+    balancing the number of lines per group (largest region first into the
+    smallest group). Lines for one destination always land in one group.
+    Returns a list of line position arrays.
+    """
+    regions = frame["Destination"].map(destination_region).to_numpy()
+    names, inverse, counts = np.unique(regions.astype(str), return_inverse=True, return_counts=True)
+    sizes = np.zeros(parts, dtype=np.int64)
+    group_of = np.empty(len(names), dtype=np.int64)
+    for region in np.argsort(-counts, kind="stable"):
+        group = int(np.argmin(sizes))
+        group_of[region] = group
+        sizes[group] += counts[region]
+    line_group = group_of[inverse]
+    return [np.flatnonzero(line_group == group) for group in range(parts) if sizes[group]]
@@ -0,0 +1,208 @@
+"""
+Load-scaling benchmark for the routing service.
+
+Generates synthetic order batches in the orders.csv schema, posts them to an
+endpoint through Flask's test client and records throughput, p50/p99 latency
+and peak RSS per batch size. Every batch size runs in a fresh process, so its
+peak RSS is its own and not the high-water mark of a larger batch before it.
+
+Timings are compared against a stored JSON baseline (one entry per endpoint)
+in units of a fixed pandas/NumPy calibration workload timed in the same run,
+so a baseline recorded on another machine does not report false regressions.
+The run fails when a batch size regresses beyond the threshold, or when the
+baseline has no entry for the endpoint or a batch size.
+
+    python route_benchmark.py                      # compare against the baseline
+    python route_benchmark.py --save-baseline      # record the baseline of this endpoint
+    python route_benchmark.py --sizes 1000 1000000 --endpoint /consolidate_loads
+"""
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from route_data import get_reference_data
+from route_engine import POUNDS_TO_KG
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "route_benchmark_baseline.json")
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_REPEATS = 5
+# Allowed slowdown against the baseline before a run fails (0.2 = 20%)
+DEFAULT_THRESHOLD = 0.2
+# Rows of the calibration workload
+CALIBRATION_ROWS = 200000
+
+
+def generate_orders(count, ref=None, seed=0):
+    """
+    Synthetic orders in the orders.csv schema. Items are drawn with the mix
+    seen in the bundled orders.csv, destinations and companies likewise, and
+    unit counts follow the same 10-unit steps, capped so that every line
+    still fits the largest truck of the fleet.
+    """
+    ref = ref or get_reference_data()
+    rng = np.random.default_rng(seed)
+    real = ref.orders
+
+    items = real["Item"].value_counts(normalize=True)
+    items = items[items.index.isin(ref.item_weights.index)]
+    destinations = real["Destination"].str.strip().value_counts(normalize=True)
+    companies = real["Company"].value_counts(normalize=True)
+
+    item = rng.choice(items.index.to_numpy(), size=count, p=(items / items.sum()).to_numpy())
+    max_units = ref.truck_index.capacities[-1] / (ref.item_weights.loc[item].to_numpy() * POUNDS_TO_KG)
+    units = rng.integers(1, 21, size=count) * 10
+    units = np.minimum(units, (max_units // 10).astype(np.int64) * 10)
+
+    return pd.DataFrame({
+        "Company": rng.choice(companies.index.to_numpy(), size=count, p=companies.to_numpy()),
+        "Item": item,
+        "Number of Units": units,
+        "Destination": rng.choice(destinations.index.to_numpy(), size=count, p=destinations.to_numpy()),
+    })
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None where unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def calibrate(repeats=DEFAULT_REPEATS):
+    """
+    Best time in ms of a fixed pandas/NumPy workload (group-by, sort, column
+    arithmetic, like a batch request) on this machine. Timings are compared
+    in units of it.
+    """
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({"key": rng.integers(0, 1000, CALIBRATION_ROWS), "value": rng.random(CALIBRATION_ROWS)})
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        frame.groupby("key")["value"].sum()
+        frame.sort_values(["key", "value"])
+        np.cumsum(frame["value"].to_numpy() * POUNDS_TO_KG)
+        times.append(time.perf_counter() - started)
+    return round(min(times) * 1000, 2)
+
+
+def measure(endpoint, size, repeats=DEFAULT_REPEATS, seed=0):
+    """Time one batch size; meant to run in a fresh process (see run_benchmark)."""
+    import route_optimization
+    from route_cache import ResultCache
+
+    # Every repeat must be computed, not served from the result cache
+    route_optimization.results = ResultCache(max_entries=0, disk_dir=None)
+    client = route_optimization.app.test_client()
+    payload = {"orders": generate_orders(size, get_reference_data(), seed).to_dict("records")}
+    body = json.dumps(payload, default=int)
+    client.post(endpoint, data=body, content_type="application/json")  # warm-up
+
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        response = client.post(endpoint, data=body, content_type="application/json")
+        latencies.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            raise RuntimeError(f"{endpoint} returned {response.status_code} for {size} lines")
+
+    latencies = np.array(latencies)
+    return {
+        "throughput_lines_per_s": round(float(size / np.median(latencies)), 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 2),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def run_benchmark(sizes, endpoint="/optimize_routes", repeats=DEFAULT_REPEATS, seed=0):
+    calibration_ms = calibrate(repeats)
+    print(f"Calibration workload: {calibration_ms} ms")
+    results = {}
+    for size in sizes:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results[str(size)] = pool.submit(measure, endpoint, size, repeats, seed).result()
+        print(f"{endpoint} {size:>8} lines: {results[str(size)]}")
+    return {
+        "endpoint": endpoint,
+        "repeats": repeats,
+        "calibration_ms": calibration_ms,
+        "machine": {"node": platform.node(), "processor": platform.processor() or platform.machine(),
+                    "cpus": os.cpu_count(), "python": platform.python_version()},
+        "results": results
+    }
+
+
+def compare(run, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Regressions of run against baseline beyond threshold, as readable strings.
+    Latency and throughput are compared relative to the calibration time of
+    each run; a missing endpoint or batch size counts as a failure too.
+    """
+    base_run = baseline.get("endpoints", {}).get(run["endpoint"])
+    if base_run is None:
+        return [f"no baseline for {run['endpoint']}; record one with --save-baseline"]
+    # > 1 when this machine (or this run) is slower than the one the baseline was recorded on
+    scale = run["calibration_ms"] / base_run["calibration_ms"]
+    regressions = []
+    for size, current in run["results"].items():
+        base = base_run["results"].get(size)
+        if base is None:
+            regressions.append(f"{size} lines: no baseline for {run['endpoint']}; record one with --save-baseline")
+            continue
+        expected = base["throughput_lines_per_s"] / scale
+        if current["throughput_lines_per_s"] < expected * (1 - threshold):
+            regressions.append(f"{size} lines: throughput {current['throughput_lines_per_s']} < "
+                               f"{expected:.1f} lines/s expected from the baseline")
+        expected = base["p99_ms"] * scale
+        if current["p99_ms"] > expected * (1 + threshold):
+            regressions.append(f"{size} lines: p99 {current['p99_ms']} > {expected:.2f} ms expected from the baseline")
+    return regressions
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {"endpoints": {}}
+    with open(path, "r") as baselineFd:
+        return json.load(baselineFd)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Load-scaling benchmark for the routing service")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Order lines per batch")
+    parser.add_argument("--endpoint", default="/optimize_routes", help="Endpoint to benchmark")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="Timed requests per batch size")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed regression (0.2 = 20%%)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    args = parser.parse_args()
+
+    run = run_benchmark(args.sizes, args.endpoint, args.repeats)
+    baseline = load_baseline(args.baseline)
+
+    if args.save_baseline:
+        baseline["endpoints"][run.pop("endpoint")] = run
+        with open(args.baseline, "w") as baselineFd:
+            json.dump(baseline, baselineFd, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        sys.exit(0)
+
+    regressions = compare(run, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from route_engine import ORDER_COLUMNS
+
+# In-memory tier bounds; ROUTE_CACHE_DIR enables a disk tier that survives restarts
+CACHE_MAX_ENTRIES = int(os.getenv("ROUTE_CACHE_MAX_ENTRIES", default=1024))
+# Serialized size of all results held, per tier; a single result above an eighth of it is not cached
+CACHE_MAX_BYTES = int(os.getenv("ROUTE_CACHE_MAX_MB", default=256)) * 1024 * 1024
+# Batches with more lines than this are solved without the cache (nightly full runs are not repeated)
+CACHE_MAX_LINES = int(os.getenv("ROUTE_CACHE_MAX_LINES", default=50000))
+CACHE_TTL_SECONDS = float(os.getenv("ROUTE_CACHE_TTL_SECONDS", default=300))
+CACHE_DIR = os.getenv("ROUTE_CACHE_DIR", default=None)
+
+
+def order_set_key(mode, frame, version, *options):
+    """
+    Canonical hash of a normalized order set, the optimization mode and its
+    options, and the reference data version. Orders that only differ in
+    stray whitespace or in numbers sent as strings hash the same.
+    """
+    normalized = frame[ORDER_COLUMNS].assign(
+        Company=frame["Company"].astype(str).str.strip(),
+        Destination=frame["Destination"].astype(str).str.strip())
+    digest = hashlib.sha256(json.dumps([mode, version, *options]).encode())
+    digest.update(pd.util.hash_pandas_object(normalized, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Optimization results keyed by order_set_key, evicted by count and
+    serialized size (LRU) and by age (TTL). Keys carry the reference data
+    version, and the cache drops everything it holds as soon as it sees a
+    new version.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS, disk_dir=CACHE_DIR,
+                 max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        # key -> (expires, value, serialized size)
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def check_version(self, version):
+        """Invalidate every entry when the reference data changes."""
+        with self.lock:
+            if version == self.version:
+                return
+            self.entries.clear()
+            self.bytes = 0
+            self.version = version
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(".json") and not name.startswith(version + "-"):
+                    self._remove(os.path.join(self.disk_dir, name))
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._pop_memory(key)
+
+        value, size = self._disk_get(key, now)
+        with self.lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._put_memory(key, value, size, now)
+            return value
+
+    def put(self, key, value):
+        data = json.dumps(value)
+        if len(data) > self.max_bytes // 8:
+            return
+        now = time.time()
+        with self.lock:
+            self._put_memory(key, value, len(data), now)
+        self._disk_put(key, data)
+
+    def _put_memory(self, key, value, size, now):
+        self._pop_memory(key)
+        self.entries[key] = (now + self.ttl, value, size)
+        self.bytes += size
+        while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+            _, (_, _, evicted) = self.entries.popitem(last=False)
+            self.bytes -= evicted
+
+    def _pop_memory(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{self.version}-{key}.json")
+
+    def _disk_get(self, key, now):
+        """Returns (value, serialized size), (None, 0) when not on disk."""
+        if not self.disk_dir:
+            return None, 0
+        path = self._disk_path(key)
+        try:
+            if os.path.getmtime(path) + self.ttl <= now:
+                self._remove(path)
+                return None, 0
+            with open(path, "r") as entryFd:
+                data = entryFd.read()
+            return json.loads(data), len(data)
+        except (OSError, ValueError):
+            return None, 0
+
+    def _disk_put(self, key, data):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            with open(path + ".tmp", "w") as entryFd:
+                entryFd.write(data)
+            os.replace(path + ".tmp", path)
+            # Keep the disk tier within the same bounds, oldest first
+            files = []
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(".json"):
+                    fileStat = os.stat(os.path.join(self.disk_dir, name))
+                    files.append((fileStat.st_mtime, fileStat.st_size, os.path.join(self.disk_dir, name)))
+            files.sort()
+            total = sum(size for _, size, _ in files)
+            for count, (_, size, old) in enumerate(files):
+                if len(files) - count <= self.max_entries and total <= self.max_bytes:
+                    break
+                self._remove(old)
+                total -= size
+        except OSError:
+            pass
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "version": self.version
+            }
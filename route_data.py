@@ -0,0 +1,242 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from route_engine import build_item_index, CapacityIndex
+
+# Resolve data/ next to this file so the service starts the same on Windows and Linux workers
+DATA_DIR = os.getenv("ROUTE_DATA_DIR", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+SNAPSHOT_NAME = ".reference_snapshot.npz"
+
+# Seconds between checks of data/ for changed reference files; 0 disables hot reload
+RELOAD_INTERVAL = float(os.getenv("ROUTE_RELOAD_INTERVAL", default=5))
+
+logger = logging.getLogger(__name__)
+
+SOURCES = {
+    "item_info": "item_info.csv",
+    "orders": "orders.csv",
+    "trucks": "trucks.xlsx",
+}
+
+
+def read_source(path):
+    """Parse one reference file the slow way (pandas CSV / openpyxl)."""
+    if path.endswith(".xlsx"):
+        return pd.read_excel(path, sheet_name="Sheet1")
+    return pd.read_csv(path)
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as sourceFd:
+        for block in iter(lambda: sourceFd.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_stamps(data_dir, with_digest=False):
+    stamps = {}
+    for name, filename in SOURCES.items():
+        path = os.path.join(data_dir, filename)
+        stamps[name] = {"mtime": os.path.getmtime(path), "size": os.path.getsize(path)}
+        if with_digest:
+            stamps[name]["sha256"] = file_digest(path)
+    return stamps
+
+
+def save_snapshot(path, tables, stamps):
+    """
+    Store every table column by column in one .npz file. Text columns become
+    fixed-width unicode arrays (no pickling) with a separate null mask.
+    """
+    arrays = {}
+    layout = {}
+    for name, frame in tables.items():
+        layout[name] = []
+        for pos, column in enumerate(frame.columns):
+            key = f"{name}/{pos}"
+            values = frame[column]
+            if values.dtype.kind in "biuf":
+                arrays[key] = values.to_numpy()
+            else:
+                nulls = values.isna().to_numpy()
+                arrays[key] = values.where(~nulls, "").astype(str).to_numpy().astype("U")
+                if nulls.any():
+                    arrays[key + "/null"] = nulls
+            layout[name].append(column)
+    arrays["__meta__"] = np.array(json.dumps({"stamps": stamps, "layout": layout}))
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as snapFd:
+        np.savez(snapFd, **arrays)
+    os.replace(tmp, path)
+
+
+def load_snapshot(path):
+    """Returns (tables, stamps) from a snapshot written by save_snapshot."""
+    with np.load(path, allow_pickle=False) as snap:
+        meta = json.loads(str(snap["__meta__"]))
+        tables = {}
+        for name, columns in meta["layout"].items():
+            data = {}
+            for pos, column in enumerate(columns):
+                key = f"{name}/{pos}"
+                values = snap[key]
+                if values.dtype.kind == "U":
+                    values = values.astype(object)
+                    if key + "/null" in snap:
+                        values[snap[key + "/null"]] = np.nan
+                data[column] = values
+            tables[name] = pd.DataFrame(data, columns=columns)
+    return tables, meta["stamps"]
+
+
+def load_tables(data_dir=DATA_DIR):
+    """
+    Load item_info, orders and trucks, going through a binary snapshot.
+
+    The snapshot is used as is when every source still has the recorded
+    mtime and size. If a source was touched, its sha256 decides whether the
+    snapshot is still valid. Otherwise the sources are parsed again and the
+    snapshot is rewritten (skipped if data_dir is not writable).
+    Returns (tables, stamps).
+    """
+    snapshot = os.path.join(data_dir, SNAPSHOT_NAME)
+    stamps = source_stamps(data_dir)
+
+    if os.path.exists(snapshot):
+        try:
+            tables, saved = load_snapshot(snapshot)
+        except (OSError, ValueError, KeyError):
+            tables, saved = None, {}
+        if tables is not None and set(saved) == set(SOURCES):
+            if all(saved[name]["mtime"] == stamps[name]["mtime"] and saved[name]["size"] == stamps[name]["size"]
+                   for name in SOURCES):
+                return tables, saved
+            stamps = source_stamps(data_dir, with_digest=True)
+            if all(saved[name]["sha256"] == stamps[name]["sha256"] for name in SOURCES):
+                _write_snapshot(snapshot, tables, stamps)
+                return tables, stamps
+
+    if "sha256" not in stamps[next(iter(SOURCES))]:
+        stamps = source_stamps(data_dir, with_digest=True)
+    tables = {name: read_source(os.path.join(data_dir, filename)) for name, filename in SOURCES.items()}
+    _write_snapshot(snapshot, tables, stamps)
+    return tables, stamps
+
+
+def _write_snapshot(path, tables, stamps):
+    try:
+        save_snapshot(path, tables, stamps)
+    except OSError:
+        pass
+
+
+class ReferenceData:
+    """
+    Reference tables plus the indexes built from them, tagged with a version.
+    Treated as immutable: a reload builds a new instance instead of updating
+    this one, so a request that took it keeps a consistent view.
+    """
+
+    def __init__(self, tables, stamps, item_weights=None, truck_index=None):
+        self.item_info = tables["item_info"]
+        self.orders = tables["orders"]
+        self.trucks = tables["trucks"]
+        # Prebuilt indexes are passed in when they live in shared memory, see route_server.py
+        self.item_weights = build_item_index(self.item_info) if item_weights is None else item_weights
+        self.truck_index = CapacityIndex(self.trucks) if truck_index is None else truck_index
+        for array in (self.truck_index.capacities, self.truck_index.truck_ids):
+            array.flags.writeable = False
+        self.stamps = stamps
+        # Content hash of all sources, short enough to show in responses and metrics
+        self.version = hashlib.sha256(
+            "".join(stamps[name]["sha256"] for name in sorted(SOURCES)).encode()).hexdigest()[:12]
+
+
+class ReferenceDataManager:
+    """
+    Owns the current ReferenceData. The first get() loads it; after that a
+    daemon thread polls the files under data_dir and, when one changes,
+    rebuilds the tables and indexes in the background and swaps the new
+    snapshot in with a single assignment. Requests never wait on a reload.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, interval=RELOAD_INTERVAL):
+        self.data_dir = data_dir
+        self.interval = interval
+        self.current = None
+        # Stamps of the files as last read; kept here because ReferenceData is never modified
+        self.stamps = None
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self._failed = None
+
+    def get(self):
+        current = self.current
+        if current is None:
+            with self._lock:
+                if self.current is None:
+                    self.current = ReferenceData(*load_tables(self.data_dir))
+                    self.stamps = self.current.stamps
+                    self._start_watcher()
+            current = self.current
+        return current
+
+    def _start_watcher(self):
+        if self.interval > 0 and self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name="reference-data-watcher", daemon=True)
+            self._watcher.start()
+
+    def _changed(self, stamps):
+        loaded = self.stamps or self.current.stamps
+        return any(stamps[name]["mtime"] != loaded[name]["mtime"] or stamps[name]["size"] != loaded[name]["size"]
+                   for name in SOURCES)
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def check(self):
+        """Poll data_dir once and reload if a source changed. Returns True if the version changed."""
+        stamps = None
+        try:
+            stamps = source_stamps(self.data_dir)
+            if self._changed(stamps) and stamps != self._failed:
+                return self.reload()
+        except Exception:
+            # A file caught mid-write fails to parse; keep serving the old snapshot
+            # and try again once the files change
+            self._failed = stamps
+            logger.exception("Reference data reload failed, keeping version %s", self.current.version)
+        return False
+
+    def reload(self):
+        """Rebuild from data_dir and swap the new snapshot in. Returns True if the version changed."""
+        fresh = ReferenceData(*load_tables(self.data_dir))
+        self.stamps = fresh.stamps
+        if fresh.version == self.current.version:
+            # Touched but identical: keep the current object, only remember the new stamps
+            return False
+        logger.info("Reference data %s -> %s", self.current.version, fresh.version)
+        self.current = fresh
+        self.reloads += 1
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+
+reference = ReferenceDataManager()
+
+
+def get_reference_data():
+    """Current reference data, loaded on first use instead of at import."""
+    return reference.get()
@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from route_data import DATA_DIR
+
+CITY_COORDS_PATH = os.path.join(DATA_DIR, "city_coords.csv")
+MATRIX_PATH = os.path.join(DATA_DIR, "distance_matrix.npy")
+INDEX_PATH = os.path.join(DATA_DIR, "distance_index.json")
+
+# All trucks start and end their journey at the Cincinnati warehouse
+ORIGIN = "Cincinnati, OH"
+
+EARTH_RADIUS_KM = 6371.0088
+# Roads are longer than the great circle; a flat circuity factor is close enough for planning
+ROAD_FACTOR = 1.2
+
+
+def normalize_city(city):
+    """Destinations in orders.csv carry stray whitespace (e.g. "Boston, MA ")."""
+    return str(city).strip()
+
+
+def load_city_coords(path=CITY_COORDS_PATH):
+    coords = pd.read_csv(path)
+    coords["City"] = coords["City"].map(normalize_city)
+    return coords
+
+
+def road_distances(lat_a, lon_a, lat_b, lon_b):
+    """Great-circle distance in km between every point of a and every point of b, times ROAD_FACTOR."""
+    lat_a, lon_a = np.radians(lat_a)[:, None], np.radians(lon_a)[:, None]
+    lat_b, lon_b = np.radians(lat_b)[None, :], np.radians(lon_b)[None, :]
+    hav = (np.sin((lat_b - lat_a) / 2) ** 2 +
+           np.cos(lat_a) * np.cos(lat_b) * np.sin((lon_b - lon_a) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(hav, 0.0, 1.0))) * ROAD_FACTOR
+
+
+def build_distance_matrix(coords_path=CITY_COORDS_PATH, matrix_path=MATRIX_PATH, index_path=INDEX_PATH):
+    """
+    Offline build step: compute all pair distances for the bundled city table
+    and save them as a memory-mappable .npy file plus a city->index map.
+
+    When a matrix already exists only cities missing from its index are
+    computed, each adding one row and column; existing entries are kept.
+    If a city of the index is no longer in the city table, the matrix is
+    built again from scratch without it. Returns the number of cities added.
+
+    Both files are written next to their final name and moved in place, so a
+    process that has the old matrix memory-mapped keeps reading the old file.
+    """
+    coords = load_city_coords(coords_path).drop_duplicates("City")
+
+    cities, matrix = [], np.zeros((0, 0))
+    if os.path.exists(matrix_path) and os.path.exists(index_path):
+        with open(index_path, "r") as indexFd:
+            cities = json.load(indexFd)["cities"]
+        matrix = np.load(matrix_path)
+        if len(cities) != len(matrix) or not set(cities) <= set(coords["City"]):
+            cities, matrix = [], np.zeros((0, 0))
+
+    known = coords.set_index("City").loc[cities]
+    added = coords[~coords["City"].isin(cities)]
+    if len(added) == 0:
+        if os.path.exists(index_path):
+            os.utime(index_path)
+        return 0
+
+    old, new = len(cities), len(added)
+    grown = np.zeros((old + new, old + new))
+    grown[:old, :old] = matrix
+    cross = road_distances(added["Latitude"].to_numpy(), added["Longitude"].to_numpy(),
+                           known["Latitude"].to_numpy(), known["Longitude"].to_numpy())
+    grown[old:, :old] = cross
+    grown[:old, old:] = cross.T
+    grown[old:, old:] = road_distances(added["Latitude"].to_numpy(), added["Longitude"].to_numpy(),
+                                       added["Latitude"].to_numpy(), added["Longitude"].to_numpy())
+    np.fill_diagonal(grown, 0.0)
+
+    # Matrix first: an old index is valid against the grown matrix, not the other way round
+    _replace_file(matrix_path, lambda matrixFd: np.save(matrixFd, grown), "wb")
+    _replace_file(index_path, lambda indexFd: json.dump({"cities": cities + added["City"].tolist()}, indexFd,
+                                                        indent=1), "w")
+    return new
+
+
+def _replace_file(path, write, mode):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, mode) as tmpFd:
+            write(tmpFd)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+class DistanceMatrix:
+    """
+    Read-only view of the prebuilt distance matrix.
+
+    The .npy file is memory-mapped, so lookups are O(1) array reads and the
+    matrix is shared through the page cache instead of copied per process.
+    """
+
+    def __init__(self, matrix_path=MATRIX_PATH, index_path=INDEX_PATH):
+        with open(index_path, "r") as indexFd:
+            cities = json.load(indexFd)["cities"]
+        self.index = {city: pos for pos, city in enumerate(cities)}
+        self.matrix = np.load(matrix_path, mmap_mode="r")
+
+    def __contains__(self, city):
+        return normalize_city(city) in self.index
+
+    def positions(self, cities):
+        """Matrix positions of cities; raises KeyError for a city not in the table."""
+        return np.array([self.index[normalize_city(city)] for city in cities], dtype=np.int64)
+
+    def distance(self, a, b):
+        return float(self.matrix[self.index[normalize_city(a)], self.index[normalize_city(b)]])
+
+    def submatrix(self, cities):
+        """Dense distances between the given cities, in the given order."""
+        pos = self.positions(cities)
+        return np.asarray(self.matrix[np.ix_(pos, pos)])
+
+
+def load_distance_matrix(matrix_path=MATRIX_PATH, index_path=INDEX_PATH, coords_path=CITY_COORDS_PATH):
+    """Memory-map the distance matrix, running the build step first if it is missing or stale."""
+    if (not os.path.exists(matrix_path) or not os.path.exists(index_path) or
+            os.path.getmtime(coords_path) > os.path.getmtime(index_path)):
+        build_distance_matrix(coords_path, matrix_path, index_path)
+    return DistanceMatrix(matrix_path, index_path)
+
+
+_distances = None
+_distances_lock = threading.Lock()
+
+
+def get_distance_matrix():
+    """Memory-map the distance matrix on first use instead of at import."""
+    global _distances
+    if _distances is None:
+        with _distances_lock:
+            if _distances is None:
+                _distances = load_distance_matrix()
+    return _distances
+
+
+if __name__ == "__main__":
+    added = build_distance_matrix()
+    print(f"Distance matrix: {added} cities added, saved to {MATRIX_PATH}")
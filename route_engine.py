@@ -0,0 +1,250 @@
+import bisect
+
+import numpy as np
+import pandas as pd
+
+# Column layout shared with data/orders.csv
+ORDER_COLUMNS = ["Company", "Item", "Number of Units", "Destination"]
+
+# item_info.csv weights are in pounds, trucks.xlsx capacities in kg
+POUNDS_TO_KG = 0.45359237
+
+
+def build_item_index(item_info):
+    """Index item_info by ItemId so weights can be fetched with a single join."""
+    return item_info.set_index("ItemId")["weight (pounds)"]
+
+
+def orders_frame(orders):
+    """
+    Turn a list of order dicts (the request payload), or a frame read from
+    an orders.csv style file, into one columnar frame.
+    """
+    if isinstance(orders, pd.DataFrame):
+        frame = orders.reindex(columns=ORDER_COLUMNS)
+    else:
+        frame = pd.DataFrame.from_records(orders, columns=ORDER_COLUMNS)
+    frame["Item"] = pd.to_numeric(frame["Item"], errors="coerce")
+    frame["Number of Units"] = pd.to_numeric(frame["Number of Units"], errors="coerce")
+    return frame
+
+
+def compute_weights(frame, item_index):
+    """
+    Join the order frame against the ItemId index and compute the weight of
+    every line in one vectorized step.
+
+    Returns (weights, valid) where valid is False for lines whose ItemId is
+    unknown or whose unit count is missing.
+    """
+    unit_weight = frame["Item"].map(item_index)
+    valid = unit_weight.notna() & frame["Number of Units"].notna()
+    weights = np.zeros(len(frame), dtype=np.int64)
+    weights[valid.to_numpy()] = (frame["Number of Units"][valid].astype(np.int64) *
+                                 unit_weight[valid].astype(np.int64)).to_numpy()
+    return weights, valid.to_numpy()
+
+
+def assign_trucks(frame, weights, valid, truck_index):
+    """
+    Give every valid line the smallest truck that can carry it.
+
+    Returns (routes, truck_pos); truck_pos is -1 for lines without a truck.
+    """
+    truck_pos = np.full(len(weights), -1)
+    truck_pos[valid] = truck_index.smallest_fits(weights[valid])
+    assigned = truck_pos >= 0
+
+    routes = [
+        {
+            "Truck ID": int(truck_id),  # Convert int64 to int
+            "Destination": destination,
+            "Weight": int(weight)  # Convert int64 to int
+        }
+        for truck_id, destination, weight in zip(truck_index.truck_ids[truck_pos[assigned]],
+                                                  frame["Destination"][assigned], weights[assigned])
+    ]
+    return routes, truck_pos
+
+
+def line_errors(frame, valid, item_index, truck_pos=None):
+    """
+    Describe every rejected order line instead of failing the whole request.
+
+    truck_pos, when given, is the CapacityIndex lookup for every line; valid
+    lines that no truck can carry are reported as well.
+    """
+    rejected = ~valid
+    if truck_pos is not None:
+        rejected |= truck_pos < 0
+    errors = []
+    for line in np.flatnonzero(rejected):
+        item = frame["Item"].iat[line]
+        if valid[line]:
+            reason = "No truck with sufficient capacity"
+        elif pd.isna(item) or item not in item_index.index:
+            reason = "Unknown ItemId"
+        else:
+            reason = "Invalid Number of Units"
+        errors.append({
+            "line": int(line),
+            "Item": None if pd.isna(item) else int(item),
+            "error": reason
+        })
+    return errors
+
+
+class CapacityIndex:
+    """
+    Trucks sorted by weight capacity, built once when trucks.xlsx is loaded.
+
+    Answers "smallest truck that fits" with a binary search over the sorted
+    capacities, either for a single weight or for every order weight at once.
+    Ties keep the file order of trucks.xlsx.
+    """
+
+    def __init__(self, trucks, presorted=False):
+        if not presorted:
+            order = np.argsort(trucks["Weight Capacity (kg)"].to_numpy(), kind="stable")
+            trucks = trucks.iloc[order].reset_index(drop=True)
+        # A presorted table is used as is (no copy), e.g. columns in shared memory
+        self.trucks = trucks
+        self.capacities = self.trucks["Weight Capacity (kg)"].to_numpy()
+        self.truck_ids = self.trucks["Truck ID"].to_numpy()
+        self._capacity_list = self.capacities.tolist()
+
+    def __len__(self):
+        return len(self.capacities)
+
+    def smallest_fit(self, weight):
+        """Position of the smallest truck that can carry weight, or -1 if none can."""
+        pos = bisect.bisect_left(self._capacity_list, weight)
+        return pos if pos < len(self.capacities) else -1
+
+    def smallest_fits(self, weights):
+        """Vectorized smallest_fit over an array of weights."""
+        pos = np.searchsorted(self.capacities, weights, side="left")
+        pos[pos >= len(self.capacities)] = -1
+        return pos
+
+
+def consolidate_loads(frame, weights, valid, truck_index):
+    """
+    Pack order lines into the fleet, grouped by Destination.
+
+    Line weights are in pounds (item_info.csv) while truck capacities are in
+    kg (trucks.xlsx), so weights are converted before packing. Each
+    destination is packed first-fit-decreasing: its heaviest line goes first
+    into the first open truck with enough remaining capacity. A new truck is
+    the smallest free one that can take everything still unpacked for the
+    destination, or the largest free one otherwise. Once the whole fleet is
+    dispatched, trucks are reused on the next trip.
+
+    Returns (loads, unassigned) where unassigned lists the line positions no
+    truck can carry.
+    """
+    weights_kg = weights * POUNDS_TO_KG
+    capacities = truck_index.capacities
+    free = np.ones(len(truck_index), dtype=bool)
+    trip = 1
+
+    loads = []
+    unassigned = []
+    lines = np.flatnonzero(valid)
+    destinations = np.char.strip(frame["Destination"].to_numpy()[lines].astype(str))
+    for destination in np.unique(destinations):
+        group = lines[destinations == destination]
+        group = group[np.argsort(-weights_kg[group], kind="stable")]
+        unpacked = weights_kg[group].sum()
+
+        open_loads = []
+        remaining = []
+        for line, weight in zip(group.tolist(), weights_kg[group].tolist()):
+            slot = next((i for i, left in enumerate(remaining) if left >= weight), -1)
+            if slot < 0:
+                if weight > capacities[-1]:
+                    unassigned.append(line)
+                    unpacked -= weight
+                    continue
+                pos = pick_truck(capacities, free, unpacked, weight)
+                if pos < 0:
+                    # Whole fleet is out, start the next trip
+                    free[:] = True
+                    trip += 1
+                    pos = pick_truck(capacities, free, unpacked, weight)
+                free[pos] = False
+                open_loads.append({
+                    "Truck ID": int(truck_index.truck_ids[pos]),
+                    "Trip": trip,
+                    "Destination": destination,
+                    "Capacity (kg)": int(capacities[pos]),
+                    "Lines": []
+                })
+                remaining.append(float(capacities[pos]))
+                slot = len(open_loads) - 1
+            open_loads[slot]["Lines"].append(line)
+            remaining[slot] -= weight
+            unpacked -= weight
+
+        for load, left in zip(open_loads, remaining):
+            load["Weight (kg)"] = round(load["Capacity (kg)"] - left, 2)
+            load["Utilization"] = round(1 - left / load["Capacity (kg)"], 4)
+        loads.extend(open_loads)
+    return loads, sorted(unassigned)
+
+
+def dispatch_fleet(loads, truck_index, weight_key):
+    """
+    Give each finished load the smallest free truck that can carry it,
+    heaviest load first, reusing trucks on a further trip once the whole
+    fleet is out. Sets Truck ID, Trip and Capacity (kg) on every load, and
+    refreshes Utilization and Duration (h) on loads that carry them.
+    """
+    capacities = truck_index.capacities
+    speeds = truck_index.trucks["Top Speed (km/h)"].to_numpy()
+    positions, trips = fleet_assignment([load[weight_key] for load in loads], capacities)
+    for load, pos, trip in zip(loads, positions.tolist(), trips.tolist()):
+        weight = load[weight_key]
+        load["Truck ID"] = int(truck_index.truck_ids[pos])
+        load["Trip"] = trip
+        load["Capacity (kg)"] = int(capacities[pos])
+        if "Utilization" in load:
+            load["Utilization"] = round(weight / capacities[pos], 4)
+        if "Distance (km)" in load:
+            load["Duration (h)"] = round(load["Distance (km)"] / speeds[pos], 2)
+    return loads
+
+
+def fleet_assignment(weights, capacities):
+    """
+    Truck position and trip number for every load weight, as handed out by
+    dispatch_fleet. Returns (positions, trips) in the order of weights.
+    """
+    weights = np.asarray(weights, dtype=float)
+    positions = np.empty(len(weights), dtype=np.int64)
+    trips = np.empty(len(weights), dtype=np.int64)
+    free = np.ones(len(capacities), dtype=bool)
+    trip = 1
+    for i in np.argsort(-weights, kind="stable").tolist():
+        weight = weights[i]
+        pos = pick_truck(capacities, free, weight, weight)
+        if pos < 0:
+            free[:] = True
+            trip += 1
+            pos = pick_truck(capacities, free, weight, weight)
+        free[pos] = False
+        positions[i] = pos
+        trips[i] = trip
+    return positions, trips
+
+
+def pick_truck(capacities, free, wanted, minimum):
+    """
+    Smallest free truck that can carry wanted, else the largest free truck
+    that can carry minimum. Returns -1 if no free truck can carry minimum.
+    """
+    candidates = np.flatnonzero(free & (capacities >= minimum))
+    if len(candidates) == 0:
+        return -1
+    fitting = candidates[capacities[candidates] >= wanted]
+    return int(fitting[0]) if len(fitting) else int(candidates[-1])
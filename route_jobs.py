@@ -0,0 +1,403 @@
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single process serves the API there
+    fcntl = None
+
+import numpy as np
+
+from route_batch import MODES, run_batch, batch_response, split_by_region
+from route_cache import CACHE_DIR
+from route_data import DATA_DIR
+from route_engine import dispatch_fleet
+from route_vrp import DEFAULT_TIME_BUDGET_MS
+
+# Worker processes shared by all jobs
+MAX_WORKERS = int(os.getenv("ROUTE_JOB_WORKERS", default=os.cpu_count() or 1))
+# Jobs queued or running at once; further submissions are rejected until one finishes
+MAX_ACTIVE_JOBS = int(os.getenv("ROUTE_MAX_ACTIVE_JOBS", default=8))
+# Finished jobs kept around for GET /jobs/<id>
+JOB_RETENTION = 256
+# Job status and results, shared by every process of this service (not by other deployments on the host)
+JOB_DIR = os.getenv("ROUTE_JOB_DIR", default=os.path.join(CACHE_DIR, "jobs") if CACHE_DIR else os.path.join(DATA_DIR, ".jobs"))
+# Batches below this many lines run as a single part
+PART_MIN_LINES = 5000
+
+# Job statuses that count against MAX_ACTIVE_JOBS
+ACTIVE = ("queued", "running")
+
+# Weight key used to hand out trucks again once the parts of a job are merged
+FLEET_WEIGHT_KEY = {"consolidate": "Weight (kg)", "multistop": "Load (kg)"}
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+# Reference data of a worker process, received once through the pool initializer
+_worker_ref = None
+
+
+def _init_worker(ref):
+    global _worker_ref
+    _worker_ref = ref
+
+
+def _start(state):
+    if state["status"] == "queued":
+        state["status"] = "running"
+
+
+def _run_part(mode, frame, lines, time_budget_ms, job_dir, job_id):
+    """
+    Solve one part of a job in a worker; line numbers are mapped back to the
+    whole batch. Returns None without solving when the job was cancelled
+    (possibly by another server process) while the part was queued.
+    """
+    state = JobStore(job_dir).update(job_id, _start)
+    if state is None or state["status"] not in ACTIVE:
+        return None
+    items, errors, stats = run_batch(mode, frame.reset_index(drop=True), _worker_ref, time_budget_ms)
+    for item in items:
+        if "Lines" in item:
+            item["Lines"] = [int(lines[line]) for line in item["Lines"]]
+    for error in errors:
+        error["line"] = int(lines[error["line"]])
+    return items, errors, stats
+
+
+class JobStore:
+    """
+    Status of every job as one small JSON file, and its result as a second
+    one, in a directory all server processes share: a poll or a cancel can
+    land on any worker of route_server.py, not only on the one that accepted
+    the job. Read-modify-write updates hold a lock file.
+    """
+
+    def __init__(self, directory=JOB_DIR, retention=JOB_RETENTION):
+        self.directory = directory
+        self.retention = retention
+        self.lock = threading.Lock()
+
+    def _path(self, job_id, kind="json"):
+        return os.path.join(self.directory, f"{job_id}.{kind}")
+
+    @contextmanager
+    def _locked(self):
+        with self.lock:
+            # Created on the first update, not when the module is imported
+            os.makedirs(self.directory, exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.directory, ".lock"), "a") as lockFd:
+                fcntl.flock(lockFd, fcntl.LOCK_EX)
+                yield
+
+    def _read(self, job_id, kind="json"):
+        try:
+            with open(self._path(job_id, kind), "r") as jobFd:
+                return json.load(jobFd)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, job_id, value, kind="json"):
+        path = self._path(job_id, kind)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as jobFd:
+            json.dump(value, jobFd)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _orphaned(state):
+        """A job still marked active whose owning process is gone (worker crashed or was killed)."""
+        if state["status"] not in ACTIVE or os.name != "posix":
+            return False
+        try:
+            os.kill(state["owner"], 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass
+        return False
+
+    def _fail_orphan(self, state):
+        state.update(status="failed", error="The server process running the job exited", finished=time.time())
+        self._write(state["job_id"], state)
+
+    def create(self, state, max_active):
+        with self._locked():
+            active = 0
+            for name in os.listdir(self.directory):
+                if not name.endswith(".json"):
+                    continue
+                other = self._read(name[:-len(".json")])
+                if other is None:
+                    continue
+                if self._orphaned(other):
+                    self._fail_orphan(other)
+                active += other["status"] in ACTIVE
+            if active >= max_active:
+                raise JobQueueFull(f"{active} jobs already queued or running")
+            self._write(state["job_id"], state)
+
+    def get(self, job_id):
+        """Status of a job, with its result once done; None for an unknown job."""
+        if not re.fullmatch(r"[0-9a-f]{32}", job_id):
+            return None
+        state = self._read(job_id)
+        if state is not None and self._orphaned(state):
+            with self._locked():
+                state = self._read(job_id)
+                if state is not None and self._orphaned(state):
+                    self._fail_orphan(state)
+        if state is not None and state["status"] == "done":
+            state["result"] = self._read(job_id, "result")
+        return state
+
+    def update(self, job_id, change):
+        """Apply change(state) under the lock and save it; None for an unknown job."""
+        if not re.fullmatch(r"[0-9a-f]{32}", job_id):
+            return None
+        with self._locked():
+            state = self._read(job_id)
+            if state is None:
+                return None
+            change(state)
+            self._write(job_id, state)
+            return state
+
+    def put_result(self, job_id, result):
+        self._write(job_id, result, "result")
+
+    def prune(self):
+        """Drop the oldest finished jobs beyond the retention."""
+        with self._locked():
+            names = [name for name in os.listdir(self.directory) if name.endswith(".json")]
+            names.sort(key=lambda name: os.path.getmtime(os.path.join(self.directory, name)))
+            excess = len(names) - self.retention
+            for name in names:
+                if excess <= 0:
+                    break
+                job_id = name[:-len(".json")]
+                state = self._read(job_id)
+                if state is not None and state["status"] in ACTIVE:
+                    continue
+                for kind in ("json", "result"):
+                    try:
+                        os.remove(self._path(job_id, kind))
+                    except OSError:
+                        pass
+                excess -= 1
+
+
+def job_view(state):
+    """The API form of a stored job."""
+    job = {key: state[key] for key in ("job_id", "mode", "status", "progress")}
+    for key in ("result", "error"):
+        if state.get(key) is not None:
+            job[key] = state[key]
+    return job
+
+
+class Job:
+    """Parts of a job in flight in this process; its status lives in the JobStore."""
+
+    def __init__(self, mode, parts):
+        self.id = uuid.uuid4().hex
+        self.mode = mode
+        self.parts = parts
+        self.parts_done = 0
+        self.results = [None] * parts
+        self.futures = []
+        self.ref = None
+
+    def state(self):
+        return {
+            "job_id": self.id,
+            "mode": self.mode,
+            "status": "queued",
+            "progress": {"parts_done": 0, "parts_total": self.parts},
+            "error": None,
+            "owner": os.getpid(),
+            "created": time.time(),
+            "finished": None
+        }
+
+
+class JobManager:
+    """
+    Runs optimization jobs on a process pool so heavy batches never block a
+    Flask worker thread. The pool is created on the first job; its workers
+    receive the reference data once, at start. Large batches are split by
+    destination region across the workers and merged when every part is in.
+    Job status and results are kept in a JobStore, so any server process can
+    answer for a job; only the process that accepted it runs it.
+    """
+
+    def __init__(self, get_reference, max_workers=MAX_WORKERS, max_active=MAX_ACTIVE_JOBS, store=None):
+        self.get_reference = get_reference
+        self.max_workers = max_workers
+        self.max_active = max_active
+        self.store = store or JobStore()
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self._pool = None
+        self._pool_ref = None
+
+    def _executor(self, ref):
+        if self._pool is None or self._pool_ref is not ref:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+            # spawn, not fork: forking a threaded Flask process can copy locks held by other threads
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                             initargs=(ref,), mp_context=multiprocessing.get_context("spawn"))
+            self._pool_ref = ref
+        return self._pool
+
+    def _split(self, mode, frame):
+        parts = min(self.max_workers, max(1, len(frame) // PART_MIN_LINES))
+        if parts == 1:
+            return [np.arange(len(frame))]
+        if mode == "routes":
+            # Independent lines; contiguous parts keep the output in input order
+            return np.array_split(np.arange(len(frame)), parts)
+        return split_by_region(frame, parts)
+
+    def submit(self, mode, frame, time_budget_ms=DEFAULT_TIME_BUDGET_MS):
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode: {mode}")
+        ref = self.get_reference()
+        parts = self._split(mode, frame)
+
+        job = Job(mode, len(parts))
+        job.ref = ref
+        state = job.state()
+        self.store.create(state, self.max_active)
+        with self.lock:
+            self.jobs[job.id] = job
+            pool = self._executor(ref)
+
+        # Submitted outside the lock: the pool calls _part_done from its own thread
+        args = (time_budget_ms, self.store.directory, job.id)
+        try:
+            futures = [pool.submit(_run_part, mode, frame.iloc[lines], lines, *args) for lines in parts]
+        except BrokenProcessPool:
+            with self.lock:
+                self._pool = None
+                pool = self._executor(ref)
+            futures = [pool.submit(_run_part, mode, frame.iloc[lines], lines, *args) for lines in parts]
+
+        with self.lock:
+            job.futures = futures
+        for part, future in enumerate(futures):
+            future.add_done_callback(lambda future, part=part: self._part_done(job, part, future))
+        return job_view(state)
+
+    def _part_done(self, job, part, future):
+        if future.cancelled():
+            return
+        exc = future.exception()
+        if exc is not None:
+            if isinstance(exc, BrokenProcessPool):
+                with self.lock:
+                    self._pool = None
+            self._finish(job, "failed", error=f"{type(exc).__name__}: {exc}")
+            return
+        result = future.result()
+        if result is None:
+            # Cancelled before the part started
+            self._drop(job)
+            return
+
+        with self.lock:
+            if job.id not in self.jobs:
+                return
+            job.results[part] = result
+            job.parts_done += 1
+            parts_done, results, ref = job.parts_done, job.results, job.ref
+
+        def progress(state):
+            if state["status"] in ACTIVE:
+                state["progress"]["parts_done"] = max(state["progress"]["parts_done"], parts_done)
+
+        state = self.store.update(job.id, progress)
+        if state is None or state["status"] not in ACTIVE:
+            # Cancelled from another process: stop the parts still queued here
+            self._drop(job)
+            return
+        if parts_done < job.parts:
+            return
+        # Only the last part gets here, so the merge runs without holding the lock
+        response = self._merge(job.mode, results, ref)
+        self.store.put_result(job.id, response)
+        self._finish(job, "done")
+
+    def _merge(self, mode, results, ref):
+        items, errors, stats = [], [], None
+        for part_items, part_errors, part_stats in results:
+            items.extend(part_items)
+            errors.extend(part_errors)
+            if part_stats:
+                stats = stats or {"time_budget_ms": part_stats["time_budget_ms"], "elapsed_ms": 0.0,
+                                  "moves": 0, "timed_out": False}
+                stats["elapsed_ms"] = max(stats["elapsed_ms"], part_stats["elapsed_ms"])
+                stats["moves"] += part_stats["moves"]
+                stats["timed_out"] |= part_stats["timed_out"]
+        if len(results) > 1 and mode in FLEET_WEIGHT_KEY:
+            # Every part packed against the whole fleet; hand out trucks once more across all parts
+            dispatch_fleet(items, ref.truck_index, FLEET_WEIGHT_KEY[mode])
+        errors.sort(key=lambda error: error["line"])
+        return batch_response(mode, items, errors, stats)
+
+    def _drop(self, job):
+        """Forget a job in this process and cancel its parts still queued."""
+        with self.lock:
+            self.jobs.pop(job.id, None)
+            futures, job.futures = job.futures, []
+            job.results = None
+            job.ref = None
+        # Outside the lock: Future.cancel() runs the done callbacks right away
+        for future in futures:
+            future.cancel()
+
+    def _finish(self, job, status, error=None):
+        def finish(state):
+            if state["status"] in ACTIVE:
+                state.update(status=status, error=error, finished=time.time())
+
+        self.store.update(job.id, finish)
+        self._drop(job)
+        self.store.prune()
+
+    def get(self, job_id):
+        state = self.store.get(job_id)
+        return job_view(state) if state is not None else None
+
+    def cancel(self, job_id):
+        """
+        Cancel a job, whichever process runs it; parts already running finish
+        in the background and are discarded.
+        """
+        def cancel(state):
+            if state["status"] in ACTIVE:
+                state.update(status="cancelled", finished=time.time())
+
+        state = self.store.update(job_id, cancel)
+        if state is None:
+            return None
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is not None:
+            self._drop(job)
+        return self.get(job_id)
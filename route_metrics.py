@@ -0,0 +1,172 @@
+"""
+Low-overhead instrumentation for the routing API: counters and fixed-bucket
+latency histograms fed by monotonic timers, rendered in the Prometheus text
+format, plus an opt-in sampling profiler that keeps the stacks of the
+slowest requests.
+"""
+import bisect
+import heapq
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implied
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Opt-in profiler: keep folded stacks of the N slowest requests in PROFILE_DIR
+PROFILE_SLOWEST = int(os.getenv("ROUTE_PROFILE_SLOWEST", default=0))
+PROFILE_DIR = os.getenv("ROUTE_PROFILE_DIR", default="profiles")
+PROFILE_INTERVAL = float(os.getenv("ROUTE_PROFILE_INTERVAL_MS", default=5)) / 1000.0
+
+HELP = {
+    "route_requests_total": ("counter", "Requests handled, by endpoint and status"),
+    "route_order_lines_total": ("counter", "Order lines processed, by endpoint"),
+    "route_request_duration_seconds": ("histogram", "Request latency, by endpoint"),
+    "route_stage_duration_seconds": ("histogram", "Latency of each processing stage"),
+}
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_histograms = {}
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    with _lock:
+        _counters[(name, _labels(labels))] += value
+
+
+def observe(name, seconds, **labels):
+    key = (name, _labels(labels))
+    bucket = bisect.bisect_left(BUCKETS, seconds)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            # Per-bucket counts plus [+Inf count, sum]
+            histogram = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        histogram[bucket] += 1
+        histogram[-1] += seconds
+
+
+@contextmanager
+def stage(name):
+    """Time a processing stage (parse, weights, truck_selection, serialize, ...)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("route_stage_duration_seconds", time.perf_counter() - started, stage=name)
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+def render(gauges=()):
+    """
+    Every metric in the Prometheus text exposition format. gauges is an
+    iterable of (name, help, labels dict, value) added at scrape time.
+    """
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(values) for key, values in _histograms.items()}
+
+    lines = []
+    described = set()
+
+    def describe(name, kind, text):
+        if name not in described:
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+            described.add(name)
+
+    for (name, labels), value in sorted(counters.items()):
+        describe(name, *HELP.get(name, ("counter", name)))
+        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+    for (name, labels), values in sorted(histograms.items()):
+        describe(name, *HELP.get(name, ("histogram", name)))
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), values[:-1]):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else f"{bound:g}"
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', le)])} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {values[-1]:.6f}")
+        lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+
+    for name, text, labels, value in gauges:
+        describe(name, "gauge", text)
+        lines.append(f"{name}{_format_labels(_labels(labels))} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+class StackSampler:
+    """Samples the stack of one thread every PROFILE_INTERVAL while a request runs."""
+
+    def __init__(self, thread_id):
+        self.thread_id = thread_id
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(PROFILE_INTERVAL):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+
+class SlowestProfiles:
+    """
+    Keeps the folded stacks (flamegraph.pl input) of the slowest requests
+    seen so far, one file per request in PROFILE_DIR.
+    """
+
+    def __init__(self, keep=PROFILE_SLOWEST, directory=PROFILE_DIR):
+        self.keep = keep
+        self.directory = directory
+        self.slowest = []
+        self.lock = threading.Lock()
+
+    def offer(self, seconds, endpoint, samples):
+        if not samples:
+            return
+        with self.lock:
+            if len(self.slowest) >= self.keep and seconds <= self.slowest[0][0]:
+                return
+            name = f"{int(seconds * 1000):08d}ms-{endpoint.strip('/').replace('/', '_')}-{time.time_ns()}.folded"
+            path = os.path.join(self.directory, name)
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, "w") as profileFd:
+                for stack, count in samples.most_common():
+                    profileFd.write(f"{stack} {count}\n")
+            heapq.heappush(self.slowest, (seconds, path))
+            if len(self.slowest) > self.keep:
+                _, evicted = heapq.heappop(self.slowest)
+                try:
+                    os.remove(evicted)
+                except OSError:
+                    pass
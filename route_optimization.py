@@ -1,41 +1,290 @@
-from flask import Flask, request, jsonify
+import io
+import json
+import threading
+import time
+from itertools import islice
+
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 import pandas as pd
-import networkx as nx
 
-# Load Data
-item_info = pd.read_csv(r"data\item_info.csv")
-orders = pd.read_csv(r"data\orders.csv")
-trucks = pd.read_excel(r"data\trucks.xlsx", sheet_name="Sheet1")
+from route_batch import run_batch, batch_response
+from route_cache import CACHE_MAX_LINES, ResultCache, order_set_key
+from route_engine import orders_frame
+from route_data import get_reference_data, reference
+from route_distance import get_distance_matrix
+from route_jobs import JobManager, JobQueueFull
+from route_session import SessionStore
+from route_vrp import DEFAULT_TIME_BUDGET_MS
+import route_metrics
+from route_metrics import stage
+
+# Reference data (item_info, orders, trucks) and the distance matrix are loaded
+# lazily on the first request, see route_data.py and route_distance.py
 
+# Order lines processed per vectorized chunk by the streaming endpoint
+STREAM_CHUNK_LINES = 10000
 
 # Initialize Flask App
 app = Flask(__name__)
 
-# Build Graph for Route Optimization
-G = nx.Graph()
+# Background optimization jobs, run on a process pool
+jobs = JobManager(get_reference_data)
+
+# Planning sessions that follow the orders of the day, see route_session.py
+sessions = SessionStore(get_reference_data, get_distance_matrix)
+
+# Results of repeated optimization requests (retries, dashboard refreshes)
+results = ResultCache()
+
+# Stacks of the slowest requests, only kept when ROUTE_PROFILE_SLOWEST is set
+profiles = route_metrics.SlowestProfiles()
+
+
+@app.before_request
+def start_request_timer():
+    g.started = time.perf_counter()
+    g.sampler = route_metrics.StackSampler(threading.get_ident()).start() if profiles.keep else None
+
+
+@app.after_request
+def record_request(response):
+    # Streamed responses are counted when their headers go out, before the body is generated
+    elapsed = time.perf_counter() - g.started
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    route_metrics.inc("route_requests_total", endpoint=endpoint, status=response.status_code)
+    route_metrics.observe("route_request_duration_seconds", elapsed, endpoint=endpoint)
+    if g.sampler is not None:
+        profiles.offer(elapsed, endpoint, g.sampler.stop())
+    return response
+
+
+def read_orders():
+    """Parse the JSON body of an order request into (body, order frame)."""
+    with stage("parse"):
+        data = request.get_json()
+        return data, orders_frame(data.get("orders", []))
+
+
+def respond(body):
+    with stage("serialize"):
+        return jsonify(body)
+
+
+def cached_batch(mode, frame, *options):
+    """Response for a mode, served from the result cache when the same order set was solved before."""
+    ref = get_reference_data()
+    route_metrics.inc("route_order_lines_total", len(frame), endpoint=request.url_rule.rule)
+    if len(frame) > CACHE_MAX_LINES:
+        items, errors, stats = run_batch(mode, frame, ref, *options)
+        return batch_response(mode, items, errors, stats)
+    results.check_version(ref.version)
+    key = order_set_key(mode, frame, ref.version, *options)
+    response = results.get(key)
+    if response is None:
+        items, errors, stats = run_batch(mode, frame, ref, *options)
+        response = batch_response(mode, items, errors, stats)
+        results.put(key, response)
+    return response
 
-# Placeholder: Add nodes (cities) and edges (distances between them)
-# In a real-world case, we'd use an API like Google Maps to get distances
 
 # API Endpoint for Delivery Optimization
 @app.route("/optimize_routes", methods=["POST"])
 def optimize_routes():
-    data = request.get_json()
-    orders = data.get("orders", [])
-
-    optimized_routes = []
-    for order in orders:
-        destination = order["Destination"]
-        weight = int(order["Number of Units"]) * int(item_info[item_info["ItemId"] == order["Item"]]["weight (pounds)"].values[0])  # Convert to int
-        truck = trucks.loc[trucks["Weight Capacity (kg)"] >= weight].iloc[0]
-        
-        optimized_routes.append({
-            "Truck ID": int(truck["Truck ID"]),  # Convert int64 to int
-            "Destination": destination,
-            "Weight": int(weight)  # Convert int64 to int
-        })
-    
-    return jsonify({"optimized_routes": optimized_routes})
+    _, frame = read_orders()
+    return respond(cached_batch("routes", frame))
+
+
+def read_order_chunks(stream, content_type):
+    """
+    Yield (line numbers, order frame, malformed) for fixed-size chunks of a
+    streamed request body: NDJSON (one order object per line) or CSV in the
+    orders.csv column layout. Blank lines are skipped and not numbered.
+    line numbers gives the line of every frame row; NDJSON lines that are not
+    a JSON object are left out of the frame and returned as malformed errors.
+    """
+    lines = (raw for raw in iter(stream.readline, b"") if raw.strip())
+    header = next(lines, b"") if content_type == "text/csv" else None
+    start = 0
+    while True:
+        chunk = list(islice(lines, STREAM_CHUNK_LINES))
+        if not chunk:
+            break
+        malformed = []
+        with stage("parse"):
+            if header is not None:
+                numbers = list(range(start, start + len(chunk)))
+                frame = orders_frame(pd.read_csv(io.BytesIO(header + b"".join(chunk))))
+            else:
+                numbers, records = [], []
+                for pos, raw in enumerate(chunk, start):
+                    try:
+                        record = json.loads(raw)
+                    except ValueError:
+                        record = None
+                    if not isinstance(record, dict):
+                        malformed.append({"line": pos, "error": "Malformed JSON"})
+                        continue
+                    numbers.append(pos)
+                    records.append(record)
+                frame = orders_frame(records)
+        yield numbers, frame, malformed
+        start += len(chunk)
+
+
+# Streaming variant of /optimize_routes for very large batches: results are sent back
+# chunk by chunk as NDJSON while the request body is still being read
+@app.route("/optimize_routes/stream", methods=["POST"])
+def optimize_routes_stream():
+    content_type = request.mimetype
+    if content_type not in ("application/x-ndjson", "text/csv"):
+        return jsonify({"error": "Expected application/x-ndjson or text/csv"}), 415
+    ref = get_reference_data()
+    stream = request.stream
+
+    def generate():
+        for numbers, frame, malformed in read_order_chunks(stream, content_type):
+            routes, errors, _ = run_batch("routes", frame, ref)
+            route_metrics.inc("route_order_lines_total", len(frame) + len(malformed),
+                              endpoint="/optimize_routes/stream")
+            with stage("serialize"):
+                out = [json.dumps(route) for route in routes]
+                for error in errors:
+                    error["line"] = numbers[error["line"]]
+                errors = sorted(errors + malformed, key=lambda error: error["line"])
+                out += [json.dumps(error) for error in errors]
+            if out:
+                yield "\n".join(out) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+# API Endpoint for consolidating order lines into truck loads per destination
+@app.route("/consolidate_loads", methods=["POST"])
+def consolidate():
+    _, frame = read_orders()
+    return respond(cached_batch("consolidate", frame))
+
+
+# API Endpoint for multi-stop routes out of Cincinnati (Clarke-Wright savings + local search)
+@app.route("/optimize_multistop_routes", methods=["POST"])
+def optimize_multistop_routes():
+    data, frame = read_orders()
+    time_budget_ms = float(data.get("time_budget_ms", DEFAULT_TIME_BUDGET_MS))
+    return respond(cached_batch("multistop", frame, time_budget_ms))
+
+
+# Asynchronous job API for heavy batches: submit, then poll or cancel
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    data, frame = read_orders()
+    mode = data.get("mode", "routes")
+    time_budget_ms = float(data.get("time_budget_ms", DEFAULT_TIME_BUDGET_MS))
+
+    try:
+        job = jobs.submit(mode, frame, time_budget_ms)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 429
+    return jsonify(job), 202
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+    return jsonify(job)
+
+
+@app.route("/jobs/<job_id>", methods=["DELETE"])
+def cancel_job(job_id):
+    job = jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+    return jsonify(job)
+
+
+# Planning session API: create a plan, then add or cancel order lines against it as they come in
+@app.route("/sessions", methods=["POST"])
+def create_session():
+    data, frame = read_orders()
+    time_budget_ms = float(data.get("time_budget_ms", DEFAULT_TIME_BUDGET_MS))
+    session = sessions.create(frame, time_budget_ms)
+    return respond(session.to_dict()), 201
+
+
+@app.route("/sessions/<session_id>", methods=["GET"])
+def get_session(session_id):
+    session = sessions.get(session_id)
+    if session is None:
+        return jsonify({"error": f"Unknown session: {session_id}"}), 404
+    return respond(session.to_dict())
+
+
+@app.route("/sessions/<session_id>", methods=["DELETE"])
+def close_session(session_id):
+    if sessions.close(session_id) is None:
+        return jsonify({"error": f"Unknown session: {session_id}"}), 404
+    return jsonify({"session_id": session_id, "status": "closed"})
+
+
+@app.route("/sessions/<session_id>/orders", methods=["POST"])
+def add_session_orders(session_id):
+    session = sessions.get(session_id)
+    if session is None:
+        return jsonify({"error": f"Unknown session: {session_id}"}), 404
+    _, frame = read_orders()
+    assigned, errors, reoptimized = session.add(frame)
+    response = {"session_id": session_id, "revision": session.revision, "assigned": assigned,
+                "drift": session.drift(), "reoptimized": reoptimized}
+    if errors:
+        response["errors"] = errors
+    return respond(response)
+
+
+@app.route("/sessions/<session_id>/cancel", methods=["POST"])
+def cancel_session_orders(session_id):
+    session = sessions.get(session_id)
+    if session is None:
+        return jsonify({"error": f"Unknown session: {session_id}"}), 404
+    cancelled, errors = session.cancel(request.get_json().get("lines", []))
+    response = {"session_id": session_id, "revision": session.revision, "cancelled": cancelled}
+    if errors:
+        response["errors"] = errors
+    return respond(response)
+
+
+@app.route("/sessions/<session_id>/reoptimize", methods=["POST"])
+def reoptimize_session(session_id):
+    session = sessions.get(session_id)
+    if session is None:
+        return jsonify({"error": f"Unknown session: {session_id}"}), 404
+    data = request.get_json(silent=True) or {}
+    session.reoptimize(float(data.get("time_budget_ms", DEFAULT_TIME_BUDGET_MS)))
+    return respond(session.to_dict())
+
+
+@app.route("/cache_stats", methods=["GET"])
+def cache_stats():
+    return jsonify(results.stats())
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Prometheus text format: requests, order lines, per-stage latency, cache and reference data."""
+    cache = results.stats()
+    gauges = [
+        ("route_cache_hits", "Result cache hits", {}, cache["hits"]),
+        ("route_cache_misses", "Result cache misses", {}, cache["misses"]),
+        ("route_cache_hit_ratio", "Result cache hit rate", {}, cache["hit_rate"]),
+        ("route_cache_entries", "Results held in memory", {}, cache["entries"]),
+        ("route_reference_reloads", "Reference data reloads since start", {}, reference.reloads),
+    ]
+    if reference.current is not None:
+        gauges.append(("route_reference_data_info", "Loaded reference data version",
+                       {"version": reference.current.version}, 1))
+    return Response(route_metrics.render(gauges), mimetype="text/plain; version=0.0.4")
 
 
 # Run API
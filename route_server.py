@@ -0,0 +1,345 @@
+"""
+Pre-fork production server for the routing API (Linux/macOS).
+
+The parent loads the reference data once, copies the item weights and the
+capacity-sorted truck table into one read-only shared memory block, binds
+the listening socket and forks the workers. Every worker serves route_optimization.app
+on the shared socket with NumPy/pandas views on that block, so N workers
+hold one copy of the reference arrays instead of N.
+
+The parent also takes over the hot reload of data/: when the reference
+data changes it publishes a new block, forks a fresh set of workers and
+retires the old ones once their in-flight requests are done.
+
+Planning sessions live in the memory of one process: the parent forks a
+dedicated session worker on a private localhost port, and the regular
+workers forward every /sessions request to it. The session worker is not
+retired on reload; it follows data/ itself. Job status is shared through
+the job store (see route_jobs.py), and the job pool processes are split
+across the workers. The result cache and metrics are per worker.
+
+    python route_server.py --host 0.0.0.0 --port 5000 --workers 8
+"""
+import gc
+import http.client
+import json
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from argparse import ArgumentParser
+from multiprocessing import shared_memory
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+from werkzeug.serving import make_server
+
+import route_optimization
+from route_data import ReferenceData, RELOAD_INTERVAL, reference
+from route_distance import get_distance_matrix
+from route_engine import CapacityIndex
+from route_jobs import MAX_WORKERS
+
+WORKERS = int(os.getenv("ROUTE_SERVER_WORKERS", default=os.cpu_count() or 1))
+# Seconds a retired worker gets to finish its requests before it is killed
+GRACEFUL_TIMEOUT = float(os.getenv("ROUTE_SERVER_GRACEFUL_TIMEOUT", default=30))
+# Seconds a worker waits for the session worker to answer a forwarded request
+SESSION_PROXY_TIMEOUT = float(os.getenv("ROUTE_SESSION_PROXY_TIMEOUT", default=120))
+
+# Hop-by-hop headers, not forwarded from the session worker's response
+HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding"}
+
+logger = logging.getLogger(__name__)
+
+
+class SharedArrays:
+    """
+    Named NumPy arrays copied into a single shared memory block. The views
+    are read-only; processes forked after creation map the same pages.
+    """
+
+    ALIGN = 64
+
+    def __init__(self, arrays):
+        offsets = {}
+        size = 0
+        for name, array in arrays.items():
+            offsets[name] = size
+            size += -(-array.nbytes // self.ALIGN) * self.ALIGN
+        self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.arrays = {}
+        for name, array in arrays.items():
+            view = np.ndarray(array.shape, dtype=array.dtype, buffer=self.shm.buf, offset=offsets[name])
+            view[...] = array
+            view.flags.writeable = False
+            self.arrays[name] = view
+        self.nbytes = size
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def close(self):
+        """Release the block; pages stay mapped until the last process using them is gone."""
+        self.arrays = {}
+        gc.collect()
+        try:
+            self.shm.close()
+        except BufferError:
+            # Views still referenced somewhere in this process; the mapping goes with the process
+            pass
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def share_reference(ref):
+    """
+    Copy of ref whose item weights and capacity-sorted truck table are views
+    on a shared memory block. Text columns of the truck table (driver names)
+    are not needed for routing and stay out of it. Returns (ref, block).
+    """
+    trucks = ref.truck_index.trucks
+    columns = [column for column in trucks.columns if trucks[column].dtype.kind in "biuf"]
+    arrays = {"item_ids": ref.item_weights.index.to_numpy(), "item_weights": ref.item_weights.to_numpy()}
+    for pos, column in enumerate(columns):
+        arrays[f"trucks/{pos}"] = trucks[column].to_numpy()
+    block = SharedArrays(arrays)
+
+    item_weights = pd.Series(block["item_weights"], index=pd.Index(block["item_ids"], name="ItemId", copy=False),
+                             name=ref.item_weights.name, copy=False)
+    sorted_trucks = pd.DataFrame({column: block[f"trucks/{pos}"] for pos, column in enumerate(columns)},
+                                 columns=columns, copy=False)
+    tables = {"item_info": ref.item_info, "orders": ref.orders, "trucks": ref.trucks}
+    shared = ReferenceData(tables, ref.stamps, item_weights, CapacityIndex(sorted_trucks, presorted=True))
+    return shared, block
+
+
+def listen(host, port, backlog=128):
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    listener = socket.socket(family, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(backlog)
+    listener.set_inheritable(True)
+    return listener
+
+
+class SessionRouter:
+    """
+    WSGI middleware of the regular workers: /sessions requests are forwarded
+    to the session worker, everything else is served here.
+    """
+
+    def __init__(self, app, address):
+        self.app = app
+        self.address = address
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        if path != "/sessions" and not path.startswith("/sessions/"):
+            return self.app(environ, start_response)
+
+        url = quote(path)
+        if environ.get("QUERY_STRING"):
+            url += "?" + environ["QUERY_STRING"]
+        body = environ["wsgi.input"].read(int(environ.get("CONTENT_LENGTH") or 0))
+        headers = {"Content-Type": environ["CONTENT_TYPE"]} if environ.get("CONTENT_TYPE") else {}
+        connection = http.client.HTTPConnection(*self.address, timeout=SESSION_PROXY_TIMEOUT)
+        try:
+            connection.request(environ["REQUEST_METHOD"], url, body=body, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+        except OSError as e:
+            start_response("503 SERVICE UNAVAILABLE", [("Content-Type", "application/json")])
+            return [json.dumps({"error": f"Session worker unavailable: {e}"}).encode()]
+        finally:
+            connection.close()
+        start_response(f"{response.status} {response.reason}",
+                       [(name, value) for name, value in response.getheaders() if name.lower() not in HOP_HEADERS])
+        return [data]
+
+
+def _serve(listener, app, shared=None, reload_interval=0, job_workers=None):
+    """
+    Body of a worker process; never returns. Regular workers get the shared
+    reference data; the session worker (shared=None) keeps the copy it was
+    forked with and reloads it itself every reload_interval seconds.
+    """
+    status = 0
+    try:
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        if shared is not None:
+            reference.current = shared
+        reference.interval = reload_interval
+        if reload_interval > 0:
+            reference._start_watcher()
+        if job_workers is not None:
+            route_optimization.jobs.max_workers = job_workers
+        host, port = listener.getsockname()[:2]
+        server = make_server(host, port, app, threaded=True, fd=listener.fileno())
+        # Let server_close() wait for requests still running when the worker is retired
+        server.daemon_threads = False
+
+        def retire(signum, frame):
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, retire)
+        server.serve_forever()
+        server.server_close()
+    except Exception:
+        logger.exception("Worker %d failed", os.getpid())
+        status = 1
+    finally:
+        os._exit(status)
+
+
+class PreforkServer:
+    def __init__(self, host="127.0.0.1", port=5000, workers=WORKERS, reload_interval=RELOAD_INTERVAL):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.reload_interval = reload_interval
+        # pid -> generation; a generation is (shared reference, shared block)
+        self.pids = {}
+        self.generation = None
+        self.retiring = {}
+        self.stopping = False
+        self.session_pid = None
+        # Job pool processes per worker, so all workers together start MAX_WORKERS
+        self.job_workers = max(1, MAX_WORKERS // workers)
+
+    def _spawn(self, generation):
+        pid = os.fork()
+        if pid == 0:
+            app = SessionRouter(route_optimization.app, self.session_listener.getsockname()[:2])
+            _serve(self.listener, app, generation[0], job_workers=self.job_workers)
+        self.pids[pid] = generation
+        return pid
+
+    def _spawn_sessions(self):
+        pid = os.fork()
+        if pid == 0:
+            _serve(self.session_listener, route_optimization.app, reload_interval=self.reload_interval)
+        self.session_pid = pid
+
+    def _publish(self, ref):
+        generation = share_reference(ref)
+        logger.info("Reference data %s in shared memory (%d bytes)", ref.version, generation[1].nbytes)
+        return generation
+
+    def _replace_workers(self, ref):
+        """Fork a full set of workers on the new reference data, then retire the old ones."""
+        old = self.generation
+        self.generation = self._publish(ref)
+        for _ in range(self.workers):
+            self._spawn(self.generation)
+        deadline = time.monotonic() + GRACEFUL_TIMEOUT
+        for pid, generation in self.pids.items():
+            if generation is old:
+                self.retiring[pid] = deadline
+                self._signal(pid, signal.SIGTERM)
+
+    @staticmethod
+    def _signal(pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _reap(self):
+        # Only our own workers: the multiprocessing resource tracker is a child too
+        if self.session_pid is not None:
+            try:
+                done, status = os.waitpid(self.session_pid, os.WNOHANG)
+            except ChildProcessError:
+                done, status = self.session_pid, -1
+            if done != 0:
+                self.session_pid = None
+                if not self.stopping:
+                    logger.warning("Session worker %d exited with status %d, open sessions are lost", done, status)
+                    self._spawn_sessions()
+        for pid in list(self.pids):
+            try:
+                done, status = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                done, status = pid, -1
+            if done == 0:
+                continue
+            generation = self.pids.pop(pid)
+            retired = self.retiring.pop(pid, None) is not None
+            if generation is self.generation and not retired and not self.stopping:
+                logger.warning("Worker %d exited with status %d, starting a new one", pid, status)
+                self._spawn(generation)
+            elif not any(g is generation for g in self.pids.values()) and generation is not self.generation:
+                generation[1].close()
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+
+    def run(self):
+        self.listener = listen(self.host, self.port)
+        self.session_listener = listen("127.0.0.1", 0)
+        # The parent polls data/ itself, without a watcher thread that would be forked along
+        reference.interval = 0
+        self.generation = self._publish(reference.get())
+        # Built (if missing or stale) and memory-mapped once here; the workers inherit the mapping
+        get_distance_matrix()
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        self._spawn_sessions()
+        for _ in range(self.workers):
+            self._spawn(self.generation)
+        logger.info("Serving on %s:%d with %d workers and a session worker on port %d", self.host, self.port,
+                    self.workers, self.session_listener.getsockname()[1])
+
+        next_check = time.monotonic() + self.reload_interval
+        try:
+            while not self.stopping:
+                time.sleep(0.2)
+                self._reap()
+                now = time.monotonic()
+                for pid, deadline in list(self.retiring.items()):
+                    if now > deadline:
+                        self._signal(pid, signal.SIGKILL)
+                if self.reload_interval > 0 and now >= next_check:
+                    next_check = now + self.reload_interval
+                    if reference.check():
+                        self._replace_workers(reference.current)
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        self.stopping = True
+        for pid in list(self.pids) + [self.session_pid]:
+            if pid is not None:
+                self._signal(pid, signal.SIGTERM)
+        deadline = time.monotonic() + GRACEFUL_TIMEOUT
+        while (self.pids or self.session_pid) and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self.pids) + [self.session_pid]:
+            if pid is not None:
+                self._signal(pid, signal.SIGKILL)
+        self._reap()
+        self.listener.close()
+        self.session_listener.close()
+        generations = {id(g): g for g in list(self.pids.values()) + [self.generation]}
+        for generation in generations.values():
+            generation[1].close()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Pre-fork multi-process server for the routing API")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=5000, help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Worker processes")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        raise SystemExit("route_server.py needs os.fork; on Windows run route_optimization.py instead")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(levelname)s %(message)s")
+    PreforkServer(args.host, args.port, args.workers).run()
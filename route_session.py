@@ -0,0 +1,329 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from route_batch import batch_response
+from route_distance import ORIGIN, normalize_city
+from route_engine import ORDER_COLUMNS, POUNDS_TO_KG, compute_weights, fleet_assignment, line_errors, pick_truck
+from route_metrics import stage
+from route_vrp import DEFAULT_TIME_BUDGET_MS, known_destinations, solve_stops
+
+# Open planning sessions; the least recently used one is dropped beyond this
+MAX_SESSIONS = int(os.getenv("ROUTE_MAX_SESSIONS", default=64))
+# Sessions not touched for this long are dropped
+SESSION_TTL_SECONDS = float(os.getenv("ROUTE_SESSION_TTL_SECONDS", default=24 * 3600))
+# Re-solve a session once its km per kg of load is this much above the last solve (0.2 = 20%); 0 turns it off
+SESSION_DRIFT = float(os.getenv("ROUTE_SESSION_DRIFT", default=0.2))
+
+
+class Stop:
+    def __init__(self, name, pos, route):
+        self.name = name
+        self.pos = pos
+        self.route = route
+        self.demand = 0.0
+        self.lines = set()
+
+
+class Route:
+    def __init__(self, truck, trip):
+        self.truck = truck
+        self.trip = trip
+        self.stops = []
+        self.load = 0.0
+        self.distance = 0.0
+
+    def path(self, origin):
+        return np.array([origin] + [stop.pos for stop in self.stops] + [origin], dtype=np.int64)
+
+
+class PlanningSession:
+    """
+    A multi-stop plan kept in memory so it can follow the orders of the day.
+
+    The base order set is solved once like /optimize_multistop_routes. After
+    that, each added line goes to a stop of its destination on a route with
+    room left, or is inserted where it lengthens a route the least, or gets
+    a route of its own on a free truck, whichever adds the least distance.
+    A cancelled line is taken off its stop and the stop off its route once
+    empty. Routes keep their truck between updates.
+
+    Cheapest insertion drifts away from a solved plan as lines come in. The
+    drift is the km per kg of load relative to the last solve; once an
+    update takes it past max_drift, the active lines are solved from scratch
+    as reoptimize() does.
+
+    The session keeps the reference data it was created with.
+    """
+
+    def __init__(self, frame, ref, distances, time_budget_ms=DEFAULT_TIME_BUDGET_MS, max_drift=SESSION_DRIFT):
+        self.id = uuid.uuid4().hex
+        self.ref = ref
+        self.distances = distances
+        self.origin = distances.index[normalize_city(ORIGIN)]
+        self.capacities = ref.truck_index.capacities
+        self.speeds = ref.truck_index.trucks["Top Speed (km/h)"].to_numpy()
+        self.lines = {}
+        self.next_line = 0
+        self.routes = []
+        self.stops_at = {}
+        self.stats = {}
+        self.revision = 0
+        self.time_budget_ms = time_budget_ms
+        self.max_drift = max_drift
+        # km per kg of load right after the last solve
+        self.solved_km_per_kg = None
+        self.lock = threading.Lock()
+
+        _, _, self.errors = self._accept(frame)
+        self._solve(time_budget_ms)
+
+    def _accept(self, frame):
+        """
+        Check new order lines and register the valid ones under fresh line ids.
+        Returns (ids, weights in kg, errors).
+        """
+        frame = frame.reset_index(drop=True)
+        weights, valid = compute_weights(frame, self.ref.item_weights)
+        known = known_destinations(frame, self.distances)
+        fits = weights * POUNDS_TO_KG <= self.capacities[-1]
+        errors = line_errors(frame, valid, self.ref.item_weights, np.where(fits, 0, -1))
+        errors += [{"line": int(line), "Destination": frame["Destination"].iat[line], "error": "Unknown Destination"}
+                   for line in np.flatnonzero(valid & ~known)]
+
+        first = self.next_line
+        self.next_line += len(frame)
+        for error in errors:
+            error["line"] += first
+        accepted = np.flatnonzero(valid & known & fits)
+        records = frame[ORDER_COLUMNS].iloc[accepted].to_dict("records")
+        ids = (accepted + first).tolist()
+        for line, record, weight in zip(ids, records, weights[accepted].tolist()):
+            self.lines[line] = {"order": record, "weight": weight, "stop": None}
+        return ids, weights[accepted] * POUNDS_TO_KG, sorted(errors, key=lambda error: error["line"])
+
+    def _solve(self, time_budget_ms):
+        """Solve every active line from scratch and hand out trucks again."""
+        ids = sorted(self.lines)
+        frame = pd.DataFrame.from_records([self.lines[line]["order"] for line in ids], columns=ORDER_COLUMNS)
+        weights = np.array([self.lines[line]["weight"] for line in ids], dtype=np.int64)
+        with stage("vrp_solve"):
+            stops, routes, _, _, self.stats = solve_stops(frame, weights, np.ones(len(ids), dtype=bool),
+                                                          self.capacities[-1], self.distances, time_budget_ms)
+
+        demands = [sum(stops[c][1] for c in route) for route in routes]
+        positions, trips = fleet_assignment(demands, self.capacities)
+        self.routes = []
+        self.stops_at = {}
+        for route, truck, trip in sorted(zip(routes, positions.tolist(), trips.tolist()),
+                                         key=lambda planned: -sum(stops[c][1] for c in planned[0])):
+            planned = Route(truck, trip)
+            for c in route:
+                name, _, lines = stops[c]
+                stop = self._new_stop(name, planned, len(planned.stops))
+                for pos in lines:
+                    self._place(ids[pos], stop, self.lines[ids[pos]]["weight"] * POUNDS_TO_KG)
+            self.routes.append(planned)
+        for planned in self.routes:
+            path = planned.path(self.origin)
+            planned.distance = float(self.distances.matrix[path[:-1], path[1:]].sum())
+        self.solved_km_per_kg = self._km_per_kg()
+
+    def _km_per_kg(self):
+        load = sum(route.load for route in self.routes)
+        return sum(route.distance for route in self.routes) / load if load > 0 else None
+
+    def _drift(self):
+        """How much longer the plan is per kg of load than right after the last solve (0.25 = 25%)."""
+        current = self._km_per_kg()
+        if current is None or not self.solved_km_per_kg:
+            return 0.0
+        return current / self.solved_km_per_kg - 1
+
+    def _check_drift(self):
+        """Solve from scratch once the plan drifted past max_drift. Returns True if it did."""
+        if self.max_drift <= 0:
+            return False
+        # A session created without lines has no solve to compare against yet
+        if self._drift() <= self.max_drift and (self.solved_km_per_kg is not None or not self.routes):
+            return False
+        self._solve(self.time_budget_ms)
+        return True
+
+    def _new_stop(self, name, route, index):
+        stop = Stop(name, self.distances.index[normalize_city(name)], route)
+        route.stops.insert(index, stop)
+        self.stops_at.setdefault(stop.pos, []).append(stop)
+        return stop
+
+    def _place(self, line, stop, weight):
+        stop.lines.add(line)
+        stop.demand += weight
+        stop.route.load += weight
+        self.lines[line]["stop"] = stop
+
+    def _insert(self, line, weight):
+        """Cheapest place for one new line against the current routes."""
+        name = str(self.lines[line]["order"]["Destination"]).strip()
+        pos = self.distances.index[normalize_city(name)]
+        matrix = self.distances.matrix
+
+        for stop in self.stops_at.get(pos, []):
+            if stop.route.load + weight <= self.capacities[stop.route.truck]:
+                self._place(line, stop, weight)
+                return stop.route
+
+        best, best_cost, best_index = None, 2 * float(matrix[self.origin, pos]), 0
+        for route in self.routes:
+            if route.load + weight > self.capacities[route.truck]:
+                continue
+            path = route.path(self.origin)
+            delta = matrix[path[:-1], pos] + matrix[pos, path[1:]] - matrix[path[:-1], path[1:]]
+            index = int(np.argmin(delta))
+            if delta[index] < best_cost:
+                best, best_cost, best_index = route, float(delta[index]), index
+
+        if best is None:
+            best = self._open_route(weight)
+            best_index = 0
+        best.distance += best_cost
+        self._place(line, self._new_stop(name, best, best_index), weight)
+        return best
+
+    def _open_route(self, weight):
+        """A route on the smallest free truck of the last trip, or a new trip once the fleet is out."""
+        trip = max((route.trip for route in self.routes), default=1)
+        free = np.ones(len(self.capacities), dtype=bool)
+        free[[route.truck for route in self.routes if route.trip == trip]] = False
+        truck = pick_truck(self.capacities, free, weight, weight)
+        if truck < 0:
+            trip += 1
+            truck = pick_truck(self.capacities, np.ones(len(self.capacities), dtype=bool), weight, weight)
+        route = Route(truck, trip)
+        self.routes.append(route)
+        return route
+
+    def add(self, frame):
+        """
+        Insert new order lines one by one, then re-solve if the plan drifted
+        too far. Returns (assigned, errors, reoptimized).
+        """
+        with self.lock, stage("session_update"):
+            ids, weights, errors = self._accept(frame)
+            for line, weight in zip(ids, weights.tolist()):
+                self._insert(line, weight)
+            reoptimized = self._check_drift()
+            assigned = []
+            for line in ids:
+                route = self.lines[line]["stop"].route
+                assigned.append({"line": line, "Truck ID": int(self.ref.truck_index.truck_ids[route.truck]),
+                                 "Trip": route.trip})
+            self.revision += 1
+            return assigned, errors, reoptimized
+
+    def cancel(self, lines):
+        """Take order lines off the plan. Returns (cancelled, errors)."""
+        with self.lock, stage("session_update"):
+            cancelled, errors = [], []
+            for line in lines:
+                if line not in self.lines:
+                    errors.append({"line": line, "error": "Unknown line"})
+                    continue
+                record = self.lines.pop(line)
+                stop, weight = record["stop"], record["weight"] * POUNDS_TO_KG
+                route = stop.route
+                stop.lines.discard(line)
+                stop.demand -= weight
+                route.load -= weight
+                if not stop.lines:
+                    self._drop_stop(stop)
+                cancelled.append(line)
+            self.revision += 1
+            return cancelled, errors
+
+    def _drop_stop(self, stop):
+        route = stop.route
+        index = route.stops.index(stop)
+        path = route.path(self.origin)
+        prev, nxt = path[index], path[index + 2]
+        matrix = self.distances.matrix
+        route.distance -= float(matrix[prev, stop.pos] + matrix[stop.pos, nxt] - matrix[prev, nxt])
+        del route.stops[index]
+        self.stops_at[stop.pos].remove(stop)
+        if not route.stops:
+            self.routes.remove(route)
+
+    def reoptimize(self, time_budget_ms=DEFAULT_TIME_BUDGET_MS):
+        with self.lock:
+            self.time_budget_ms = time_budget_ms
+            self._solve(time_budget_ms)
+            self.revision += 1
+
+    def drift(self):
+        with self.lock:
+            return round(self._drift(), 4)
+
+    def to_dict(self):
+        with self.lock:
+            items = []
+            for route in self.routes:
+                names = []
+                for stop in route.stops:
+                    if not names or names[-1] != stop.name:
+                        names.append(stop.name)
+                items.append({
+                    "Stops": names,
+                    "Lines": sorted(line for stop in route.stops for line in stop.lines),
+                    "Load (kg)": round(max(route.load, 0.0), 2),
+                    "Distance (km)": round(route.distance, 1),
+                    "Truck ID": int(self.ref.truck_index.truck_ids[route.truck]),
+                    "Trip": route.trip,
+                    "Capacity (kg)": int(self.capacities[route.truck]),
+                    "Duration (h)": round(route.distance / self.speeds[route.truck], 2)
+                })
+            plan = {"session_id": self.id, "revision": self.revision, "active_lines": len(self.lines),
+                    "drift": round(self._drift(), 4)}
+            plan.update(batch_response("multistop", items, self.errors, self.stats))
+            return plan
+
+
+class SessionStore:
+    """Open planning sessions, dropped when idle for too long or least recently used beyond max_sessions."""
+
+    def __init__(self, get_reference, get_distances, max_sessions=MAX_SESSIONS, ttl=SESSION_TTL_SECONDS):
+        self.get_reference = get_reference
+        self.get_distances = get_distances
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def create(self, frame, time_budget_ms=DEFAULT_TIME_BUDGET_MS):
+        session = PlanningSession(frame, self.get_reference(), self.get_distances(), time_budget_ms)
+        with self.lock:
+            self.sessions[session.id] = (time.time(), session)
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        return session
+
+    def get(self, session_id):
+        now = time.time()
+        with self.lock:
+            for expired in [key for key, (touched, _) in self.sessions.items() if touched + self.ttl <= now]:
+                del self.sessions[expired]
+            entry = self.sessions.get(session_id)
+            if entry is None:
+                return None
+            self.sessions[session_id] = (now, entry[1])
+            self.sessions.move_to_end(session_id)
+            return entry[1]
+
+    def close(self, session_id):
+        with self.lock:
+            entry = self.sessions.pop(session_id, None)
+        return entry[1] if entry else None
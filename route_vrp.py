@@ -0,0 +1,259 @@
+import time
+
+import numpy as np
+
+from route_engine import POUNDS_TO_KG, dispatch_fleet
+from route_distance import ORIGIN, normalize_city
+
+# Latency limit for one solve; requests may ask for less but never more
+MAX_TIME_BUDGET_MS = 5000
+DEFAULT_TIME_BUDGET_MS = 1000
+
+# Moves must improve the route length by more than this (km) to count
+EPSILON = 1e-9
+
+
+def split_stops(frame, weights, valid, capacity):
+    """
+    Group valid order lines into stops by Destination with demand in kg.
+
+    A destination whose demand exceeds capacity (the largest truck) is split
+    into several stops, each filled with the heaviest remaining lines first.
+    Returns (stops, unassigned) where each stop is a (city, demand, lines)
+    tuple and unassigned lists lines heavier than any truck.
+    """
+    weights_kg = weights * POUNDS_TO_KG
+    lines = np.flatnonzero(valid)
+    destinations = np.char.strip(frame["Destination"].to_numpy()[lines].astype(str))
+
+    stops, unassigned = [], []
+    for destination in np.unique(destinations):
+        group = lines[destinations == destination]
+        group = group[np.argsort(-weights_kg[group], kind="stable")]
+        chunks = []
+        for line, weight in zip(group.tolist(), weights_kg[group].tolist()):
+            if weight > capacity:
+                unassigned.append(line)
+                continue
+            chunk = next((c for c in chunks if c[1] + weight <= capacity), None)
+            if chunk is None:
+                chunk = [destination, 0.0, []]
+                chunks.append(chunk)
+            chunk[1] += weight
+            chunk[2].append(line)
+        stops.extend(tuple(chunk) for chunk in chunks)
+    return stops, sorted(unassigned)
+
+
+def clarke_wright(dist, demands, capacity, deadline):
+    """
+    Parallel Clarke-Wright savings construction.
+
+    dist is the (n + 1) x (n + 1) matrix with the depot at position 0 and
+    customer i at position i + 1. Savings for every pair are computed in one
+    vectorized step; merges are then applied in order of decreasing saving.
+    If the deadline passes, customers not merged yet keep their own route.
+    """
+    n = len(demands)
+    routes = {i: [i] for i in range(n)}
+    route_of = np.arange(n)
+    load = np.asarray(demands, dtype=float).copy()
+    if n < 2:
+        return list(routes.values())
+
+    iu, ju = np.triu_indices(n, 1)
+    savings = dist[0, iu + 1] + dist[0, ju + 1] - dist[iu + 1, ju + 1]
+    order = np.argsort(-savings, kind="stable")
+    order = order[savings[order] > EPSILON]
+
+    for count, k in enumerate(order.tolist()):
+        if count % 1024 == 0 and time.perf_counter() > deadline:
+            break
+        i, j = iu[k], ju[k]
+        ri, rj = route_of[i], route_of[j]
+        if ri == rj or load[ri] + load[rj] > capacity:
+            continue
+        a, b = routes[ri], routes[rj]
+        if a[-1] == i and b[0] == j:
+            merged = a + b
+        elif a[0] == i and b[-1] == j:
+            merged = b + a
+        elif a[0] == i and b[0] == j:
+            merged = a[::-1] + b
+        elif a[-1] == i and b[-1] == j:
+            merged = a + b[::-1]
+        else:
+            continue
+        routes[ri] = merged
+        load[ri] += load[rj]
+        route_of[b] = ri
+        del routes[rj]
+    return list(routes.values())
+
+
+def route_length(route, dist):
+    path = np.concatenate(([0], np.asarray(route) + 1, [0]))
+    return float(dist[path[:-1], path[1:]].sum())
+
+
+def two_opt(route, dist, deadline):
+    """
+    Best-improvement 2-opt on a single route. All edge pairs are evaluated
+    at once: reversing path[i + 1..j] replaces edges (a_i, b_i) and
+    (a_j, b_j) with (a_i, a_j) and (b_i, b_j).
+    """
+    path = np.concatenate(([0], np.asarray(route) + 1, [0]))
+    moves = 0
+    while len(path) > 4 and time.perf_counter() < deadline:
+        a, b = path[:-1], path[1:]
+        current = dist[a, b]
+        delta = (dist[a[:, None], a[None, :]] + dist[b[:, None], b[None, :]] -
+                 current[:, None] - current[None, :])
+        delta[np.tril_indices(len(a), 1)] = np.inf
+        best = int(np.argmin(delta))
+        i, j = divmod(best, len(a))
+        if delta[i, j] >= -EPSILON:
+            break
+        path[i + 1:j + 1] = path[i + 1:j + 1][::-1]
+        moves += 1
+    return (path[1:-1] - 1).tolist(), moves
+
+
+def or_opt(routes, loads, dist, demands, capacity, deadline, max_segment=3):
+    """
+    Try to relocate one segment of up to max_segment consecutive stops to
+    another position, in the same or another route, possibly reversed.
+    Insertion costs are evaluated against every edge of every route at once.
+    Applies the best insertion for the first segment that improves the
+    solution and returns True, or False if no segment does.
+    """
+    edge_u, edge_v, edge_route, edge_pos = [], [], [], []
+    for r, route in enumerate(routes):
+        path = [0] + [c + 1 for c in route] + [0]
+        edge_u.extend(path[:-1])
+        edge_v.extend(path[1:])
+        edge_route.extend([r] * (len(path) - 1))
+        edge_pos.extend(range(len(path) - 1))
+    edge_u, edge_v = np.array(edge_u), np.array(edge_v)
+    edge_route, edge_pos = np.array(edge_route), np.array(edge_pos)
+    edge_cost = dist[edge_u, edge_v]
+    loads = np.asarray(loads)
+
+    for r, route in enumerate(routes):
+        path = [0] + [c + 1 for c in route] + [0]
+        for length in range(1, min(max_segment, len(route)) + 1):
+            for start in range(len(route) - length + 1):
+                if time.perf_counter() > deadline:
+                    return False
+                first, last = path[start + 1], path[start + length]
+                prev, nxt = path[start], path[start + length + 1]
+                gain = dist[prev, first] + dist[last, nxt] - dist[prev, nxt]
+                seg_load = sum(demands[c] for c in route[start:start + length])
+
+                forward = dist[edge_u, first] + dist[last, edge_v] - edge_cost
+                backward = dist[edge_u, last] + dist[first, edge_v] - edge_cost
+                cost = np.minimum(forward, backward)
+                # Edges touching the segment itself, and routes without room for it
+                cost[(edge_route == r) & (edge_pos >= start) & (edge_pos <= start + length)] = np.inf
+                cost[(edge_route != r) & (loads[edge_route] + seg_load > capacity)] = np.inf
+
+                best = int(np.argmin(cost))
+                if cost[best] - gain >= -EPSILON:
+                    continue
+
+                segment = route[start:start + length]
+                if backward[best] < forward[best]:
+                    segment = segment[::-1]
+                target, pos = int(edge_route[best]), int(edge_pos[best])
+                del route[start:start + length]
+                if target == r and pos > start:
+                    pos -= length
+                routes[target][pos:pos] = segment
+                if target != r:
+                    loads[r] -= seg_load
+                    loads[target] += seg_load
+                if not route:
+                    del routes[r]
+                return True
+    return False
+
+
+def solve_vrp(dist, demands, capacity, time_budget_ms=DEFAULT_TIME_BUDGET_MS):
+    """
+    Build multi-stop routes out of the depot with Clarke-Wright savings and
+    improve them with 2-opt and or-opt until no move helps or the time
+    budget runs out. Always returns the best solution found so far.
+    """
+    started = time.perf_counter()
+    deadline = started + min(time_budget_ms, MAX_TIME_BUDGET_MS) / 1000.0
+    demands = np.asarray(demands, dtype=float)
+
+    routes = clarke_wright(dist, demands, capacity, deadline)
+    moves = 0
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        for r, route in enumerate(routes):
+            routes[r], route_moves = two_opt(route, dist, deadline)
+            moves += route_moves
+        loads = [demands[route].sum() for route in routes]
+        improved = or_opt(routes, loads, dist, demands, capacity, deadline)
+        moves += improved
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        "time_budget_ms": min(time_budget_ms, MAX_TIME_BUDGET_MS),
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "moves": int(moves),
+        "timed_out": time.perf_counter() >= deadline
+    }
+    return routes, stats
+
+
+def solve_stops(frame, weights, valid, capacity, distances, time_budget_ms=DEFAULT_TIME_BUDGET_MS):
+    """
+    split_stops followed by solve_vrp against one capacity. Returns
+    (stops, routes, dist, unassigned, stats) where routes list stop
+    positions in visiting order and dist is the depot-first submatrix.
+    """
+    stops, unassigned = split_stops(frame, weights, valid, capacity)
+    if not stops:
+        return [], [], None, unassigned, {}
+
+    dist = distances.submatrix([ORIGIN] + [stop[0] for stop in stops])
+    routes, stats = solve_vrp(dist, [stop[1] for stop in stops], capacity, time_budget_ms)
+    return stops, routes, dist, unassigned, stats
+
+
+def plan_routes(frame, weights, valid, truck_index, distances, time_budget_ms=DEFAULT_TIME_BUDGET_MS):
+    """
+    Multi-stop routing for a batch of order lines.
+
+    Stops are solved against the largest truck capacity, then trucks are
+    handed out with dispatch_fleet. Durations use the truck's
+    Top Speed (km/h). Returns (routes, unassigned, stats).
+    """
+    stops, routes, dist, unassigned, stats = solve_stops(frame, weights, valid, truck_index.capacities[-1],
+                                                         distances, time_budget_ms)
+    if not stops:
+        return [], unassigned, {}
+    demands = [stop[1] for stop in stops]
+
+    planned = []
+    for route in sorted(routes, key=lambda route: -sum(demands[c] for c in route)):
+        stop_names = []
+        for c in route:
+            if not stop_names or stop_names[-1] != stops[c][0]:
+                stop_names.append(stops[c][0])
+        planned.append({
+            "Stops": stop_names,
+            "Lines": sorted(line for c in route for line in stops[c][2]),
+            "Load (kg)": round(sum(demands[c] for c in route), 2),
+            "Distance (km)": round(route_length(route, dist), 1)
+        })
+    dispatch_fleet(planned, truck_index, "Load (kg)")
+    return planned, unassigned, stats
+
+
+def known_destinations(frame, distances):
+    """Mask of order lines whose Destination is in the distance matrix."""
+    return np.array([normalize_city(city) in distances for city in frame["Destination"]], dtype=bool)
@@ -15,70 +15,61 @@ Dell Inc.
 ############################################################################
 import os
 import sys
+import time
 import subprocess
 from pathlib import Path
 from argparse import ArgumentParser
 from argparse import Namespace
 import inspect
 import platform
-from typing import Tuple
+from typing import Optional, Tuple
 import logging
 
 from envSetup import *
+from agsBootstrap import AgsModule
+from downloadScheduler import DownloadJob, RunDownloads, PrintDownloadSummary
+from artifactCache import ArtifactCache
+from submoduleCheckout import CheckoutSubmodules
+from venvProvisioner import ProvisionVirtualEnv
+import setupTrace
+from setupTrace import traced, span
+from setupTasks import SetupTask, FingerprintStore, RunTaskGraph, PrintTaskSummary, fileStamp, treeStamp
 
 # ############################################################################
 # ## Variables
 # ############################################################################
-AGS_SCRIPT_URL = "ssh://git@miller.amer.dell.com/cdc/ags_scripts.git"
-AGS_SCRIPT_BRANCH = "main"
 PY_VERSION = "Python312_v1"
 PY_DIR = os.path.join(os.getenv("BUILDTOOLS_PATH_OVERRIDE"), PY_VERSION)
 PY_VER_PATH = os.path.join(BASE_BUILDTOOLS_PATH, f".{PROJECT_ID}_pyver")
 PY_VENV_DIR = os.path.join(os.getenv("BUILDTOOLS_PATH_OVERRIDE"), f".{PROJECT_ID}_{PY_VERSION}.venv")
-INCLUDE_FILES = {__name__}
 logger = logging.getLogger(__name__)
 
-#
-# @brief     cloneUpdateAgSScripts
-# @details   Clone or update ags_scritps to manage platform build management.
-#
-def cloneUpdateAgSScripts():
-    funcName = inspect.currentframe().f_code.co_name + '()'
-    # Create the DevTools dir if it does not exist
-    devToolsDir = os.path.join(BASE_BUILDTOOLS_PATH, "DevTools")
-    os.makedirs(name = devToolsDir, exist_ok = True)
-
-    scriptsDir = os.path.join(devToolsDir, "ags_scripts")
-    print(f"scriptsDir: {scriptsDir}")
-
-    # Clone the ags_scripts repo to {BASE_BUILDTOOLS_PATH}/DevTools/Scripts
-    if os.path.exists(scriptsDir):
-        clCmd = f"cd {scriptsDir} && git checkout {AGS_SCRIPT_BRANCH} && git pull origin {AGS_SCRIPT_BRANCH}"
-    else:
-        clCmd = f"git clone --branch {AGS_SCRIPT_BRANCH} {AGS_SCRIPT_URL} {scriptsDir}"
-    print(clCmd)
-    retVal = os.system(clCmd)
-    if retVal != 0:
-        print(f"Cloning Ags-Scripts failed with, returncode={retVal}, bailing out...")
-        sys.exit(1)
-    print(f"{funcName}: Ags-Scripts cloned and copied successfully...")
-
-
-# Call to clone/update the ags_script download
-cloneUpdateAgSScripts()
+# repoConfig.yaml lists fetched by DownloadCompilersTools:
+#   base URL (environment variable, else artifactSettings key), URL of an entry under it,
+#   biosEnvSettings directory the archive is extracted under
+# An entry may also carry its own "url" and a "sha256" to verify the archive against.
+# CPG_BIOS_DEV_COMPILERS_URL is the existing artifactSettings key; the other base URLs are only
+# known once set. An entry whose URL cannot be built is reported as a failed download.
+DOWNLOAD_LISTS = {
+    "COMPILERS":           ("CPG_BIOS_DEV_COMPILERS_URL", "{base}/{ver}.7z",        "BuildToolsDir"),
+    "DEV_TOOL_LIST":       ("CPG_BIOS_DEV_TOOLS_URL",     "{base}/{name}/{ver}.7z", "DevToolsDir"),
+    "OPENSSL_BINARY_LIST": ("CPG_BIOS_OPENSSL_URL",       "{base}/{name}/{ver}.7z", "BuildToolsDir"),
+    "DPF_BINARIES_LIST":   ("CPG_BIOS_DPF_URL",           "{base}/{name}/{ver}.7z", "BuildToolsDir"),
+}
+# Lists with a downloader of their own, used instead when the base URL above is not set
+OWN_DOWNLOADER_LISTS = {"DPF_BINARIES_LIST"}
 
 ############################################################################
 ## Imports from agsscripts
 ############################################################################
-from biosCommonDefs import biosEnvSettings, artifactSettings
-import biosCommonFuncs
-import configSupport
-import credSupport
-import prepare_tools
-import transferHelper
-
-from DellPkgs.BuildTools.DellTools.envSupport import InitializeWsEnv
-from DellPkgs.BuildTools.DellTools.platformSupport import DownloadDpfBinPackages
+# Imported on first use: ags_scripts is cloned or updated only by the commands that need it
+biosCommonDefs = AgsModule("biosCommonDefs")
+biosCommonFuncs = AgsModule("biosCommonFuncs")
+configSupport = AgsModule("configSupport")
+credSupport = AgsModule("credSupport")
+prepare_tools = AgsModule("prepare_tools")
+envSupport = AgsModule("DellPkgs.BuildTools.DellTools.envSupport")
+platformSupport = AgsModule("DellPkgs.BuildTools.DellTools.platformSupport")
 
 ############################################################################
 ## Function Implementation
@@ -102,47 +93,12 @@ def initEnv():
     return buildToolsPath
 
 
-def trace_statements(frame, event, arg):
-    if event == 'line':
-        # Get filename and line number
-        filename = os.path.basename(frame.f_code.co_filename)
-        lineno = frame.f_lineno
-        # Get the name of the function currently being executed
-        func_name = frame.f_code.co_name
-
-        # Optionally, get the line of code itself (requires reading the file)
-        # For simplicity, we'll just print filename, line number, and function name
-        print(f"[{filename}:{lineno}] - {func_name}() - Executing line.")
-    return trace_statements
-
-def custom_trace(frame, event, arg):
-    filename = os.path.basename(frame.f_code.co_filename)
-    lineno = frame.f_lineno
-    func_name = frame.f_code.co_name
-
-    # Optional: Filter by file
-    if INCLUDE_FILES and filename not in INCLUDE_FILES:
-        return custom_trace # Continue tracing, but ignore this file
-
-    # Log based on event type
-    if event == 'line':
-        logger.info(f"LINE: [{filename}:{lineno}] - {func_name}()")
-    elif event == 'call':
-        logger.info(f"CALL: [{filename}:{lineno}] - Entering {func_name}()")
-    elif event == 'return':
-        logger.info(f"RETURN: [{filename}:{lineno}] - Exiting {func_name}() (Returned: {arg})")
-    elif event == 'exception':
-        exc_type, exc_value, _ = arg
-        logger.error(f"EXCEPTION: [{filename}:{lineno}] - In {func_name}() - {exc_type.__name__}: {exc_value}")
-
-    return custom_trace
-
-
 #
 # @brief     deployVirtualEnv
 # @details   Setup and/or update the Python virtual environment and install dependencies
 # @param pydir: Python Install Path
 
+@traced()
 def deployVirtualEnv(pydir: str) -> str:
     funcName = inspect.currentframe().f_code.co_name + '()'
 
@@ -151,15 +107,21 @@ def deployVirtualEnv(pydir: str) -> str:
     requirementsPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "py_requirements.txt")
 
     if not os.path.exists(venvPath):
-        subprocess.run([pypath, "-m", "venv", venvPath])
+        setupTrace.run([pypath, "-m", "venv", venvPath])
         print(f"{funcName}: Python virtual environment created at {venvPath}")
 
-    if biosEnvSettings['ServerEnv'] == False:    
-        subprocess.run([os.path.join(venvPath, "Scripts", "python"), "-m", "pip", "install", "--upgrade", "pip"])
-        subprocess.run([os.path.join(venvPath, "Scripts", "python"), "-m", "pip", "install", "-r", requirementsPath])
-        subprocess.run([os.path.join(venvPath, "Scripts", "python"), "-m", "pip", "list"])
-
-    print(f"{funcName}: Python module requirements installed...")
+    if biosCommonDefs.biosEnvSettings['ServerEnv'] == False:
+        # Skipped when requirements, interpreter and pip match the stamp of the last run
+        try:
+            result = ProvisionVirtualEnv(venvPath, requirementsPath)
+        except subprocess.CalledProcessError as e:
+            # No stamp is written, the next run installs again
+            result = "failed"
+            print(f"{funcName}: pip failed with returncode={e.returncode}: {e.cmd}")
+        if result == "unchanged":
+            print(f"{funcName}: Python module requirements up to date, nothing to install...")
+        elif result != "failed":
+            print(f"{funcName}: Python module requirements installed ({result})...")
 
     print(f"[NOTE] {funcName}: !!!!! Use the virtual environment @{venvPath} for activation for all your future build sessions !!!!!")
 
@@ -251,21 +213,22 @@ def is_in_venv() -> bool:
 # @param WsDir (str): Workspace path
 # @param PythonToolPath (str): The Python command to use for running scripts.
 #
+@traced()
 def SetupGitTemplates(WsDir, PythonToolPath):
     # Copy everything from GitFiles to the .git directory
     print("SetupGitTemplates() Start")
 
-    if os.path.exists(biosEnvSettings['DevToolsDir']):
+    if os.path.exists(biosCommonDefs.biosEnvSettings['DevToolsDir']):
         repoGitDir = os.path.join(WsDir, '.git')
         repoGitHooksDir = os.path.join(repoGitDir, 'hooks')
-        gitTemplateDir = os.path.join(biosEnvSettings['DevToolsDir'], 'ags_scripts', 'python', 'GitFiles')
+        gitTemplateDir = os.path.join(biosCommonDefs.biosEnvSettings['DevToolsDir'], 'ags_scripts', 'python', 'GitFiles')
 
         # Copy the commit template file
         biosCommonFuncs.CopyFile2(os.path.join(gitTemplateDir, 'Commit-Template.txt'), os.path.join(repoGitDir, 'Commit-Template.txt'))
 
         # Set the template for the superproject's commit log
         if os.path.exists(os.path.join(gitTemplateDir, 'Commit-Template.txt')):
-            subprocess.run(['git', 'config', '--local', 'commit.template', os.path.join(repoGitDir, 'Commit-Template.txt')], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            setupTrace.run(['git', 'config', '--local', 'commit.template', os.path.join(repoGitDir, 'Commit-Template.txt')], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
         # Copy the pre-push hook to every hooks directory in .git/modules
         for file in os.listdir(os.path.join(gitTemplateDir, 'hooks')):
@@ -287,116 +250,211 @@ def SetupGitTemplates(WsDir, PythonToolPath):
     else:
         print("Error: DevToolsPath does not exist")
 
+#
+# @brief     downloadBaseUrl
+# @details   Base URL of a repoConfig.yaml download list, None if it is not configured
+#
+def downloadBaseUrl(group: str) -> Optional[str]:
+    urlKey = DOWNLOAD_LISTS[group][0]
+    baseUrl = os.getenv(urlKey, default=biosCommonDefs.artifactSettings.get(urlKey))
+    return baseUrl.rstrip("/") if baseUrl else None
+
+#
+# @brief     downloadJobs
+# @details   DownloadJob for every entry of the repoConfig.yaml download lists. Entries without a URL
+#            come back already failed ("<key> not set"), except for lists in OWN_DOWNLOADER_LISTS,
+#            which are then left out. COMPILERS must be in repoConfig.yaml.
+#
+def downloadJobs(RootDir: str, verbose: bool = False) -> list:
+    repoConfigData = configSupport.LoadYamlData(os.path.join(RootDir, 'repoConfig.yaml'))
+    jobs = []
+    for group, (urlKey, urlTemplate, outDirKey) in DOWNLOAD_LISTS.items():
+        entries = repoConfigData['COMPILERS'] if group == 'COMPILERS' else repoConfigData.get(group, [])
+        baseUrl = downloadBaseUrl(group)
+        if baseUrl is None and group in OWN_DOWNLOADER_LISTS:
+            if verbose:
+                print(f"{group}: {urlKey} not set, left to its own downloader")
+            continue
+        if verbose:
+            print(f"{group} to Download: {entries}")
+        for entry in entries:
+            url = entry.get('url')
+            if not url and baseUrl:
+                url = urlTemplate.format(base=baseUrl, name=entry['name'], ver=entry['ver'])
+            job = DownloadJob(group, entry['name'], url or "",
+                              os.path.join(biosCommonDefs.biosEnvSettings[outDirKey], entry['out']), entry.get('sha256'))
+            if not url:
+                job.status = "failed"
+                job.error = f"{urlKey} not set"
+            jobs.append(job)
+    return jobs
+
 #
 # @brief     DownloadCompilersTools
 # @details   Download compilers and tools defined in repoConfig.yaml
+#            COMPILERS, DEV_TOOL_LIST, OPENSSL_BINARY_LIST and DPF_BINARIES_LIST entries are fetched
+#            concurrently, resuming partial downloads, and each .7z is extracted while the others
+#            are still downloading. Entries without a URL are not fetched but fail the summary,
+#            which reports every failure.
 #
 # @param RootDir    Edk2 package directory
 # @param Override   True: Download the tools and override the old onces
 #                   False: Default. Skips downloading the tools, if the output directory exist
 #
+@traced()
 def DownloadCompilersTools(RootDir: str, Override: bool = False) -> bool:
     RootBuild = os.getenv("ROOT_BUILD", default=os.path.join(os.getenv("BUILDTOOLS_PATH_OVERRIDE"), "temp"))
-    retVal = False
+    jobs = downloadJobs(RootDir, verbose=True)
 
-    # Get compilers binaries
-    repoConfigData = configSupport.LoadYamlData(os.path.join(RootDir, 'repoConfig.yaml'))
-    print(f"Compilers to Download: {repoConfigData['COMPILERS']}")
-    for compiler in repoConfigData['COMPILERS']:
-        print(f"compiler: {compiler}")
-        retVal = transferHelper.DownloadWithCurl(RootBuild,
-                        f"{artifactSettings['CPG_BIOS_DEV_COMPILERS_URL']}/{compiler['ver']}.7z",
-                        f"{os.path.join(biosEnvSettings['BuildToolsDir'], compiler['out'])}",
-                        Override)
-        # In case of failure exit download 
-        if retVal == False:
-            break
-    return retVal
+    # Tools in the machine-wide cache that still match the server's checksum are linked in without
+    # a download; with --force every tool is downloaded again and replaces its cache entry
+    RunDownloads([job for job in jobs if job.status == "pending"], os.path.join(RootBuild, "downloads"),
+                 Override, cache=ArtifactCache())
+    return PrintDownloadSummary(jobs)
 
 
 # @brief     setupRepoInit
 # @details   Process the command line arguments
+#            The requested steps run as a task graph: each task starts once the tasks it depends
+#            on are through, independent ones (git templates, submodules, tool downloads)
+#            concurrently. The venv waits for the tool downloads, which may replace its
+#            interpreter, and a failed credentials check stops the setup. Tasks declaring inputs
+#            are skipped while those match the fingerprint of their last successful run
+#            (Build/setupFingerprints.json) and their outputs exist.
 # @param args: Command line arguments
 
 def setupRepoInit(args: Namespace) -> None:
     funcName = inspect.currentframe().f_code.co_name + '()'
+    InitializeWorkspaceDirs()
     repoRootDir = f"{WORKSPACE_ROOT}"
     os.environ['REPO_ROOT'] = repoRootDir  ## Use local repo root
-    repoConfigData = {}
-    retVal = False
+    repoConfigPath = os.path.join(repoRootDir, 'repoConfig.yaml')
+    ctx = {}
+    started = time.perf_counter()
 
     print(f"{funcName}: Repo Root: {repoRootDir}")
 
-    if args.env:
-        exists, pydir = isPythonVenvExists()
-        if not exists:
-            pydir = os.path.join(os.getenv("BUILDTOOLS_PATH_OVERRIDE"), PY_VERSION)
-            setUpPythonEnv(pydir)
-        else:
-            print(f"{funcName}: Python virtual environment already exists at {pydir}.venv, checking for updates...")
-            deployVirtualEnv(pydir)
-
-            if is_in_venv(): # if this script is running in the virtual environment
-                if not prepare_tools.hasValidCredentials():
-                    print(f"{funcName}: Credentials not set, please set up the credentials with -c option and try again...")
-                    sys.exit(1)
-                    # retVal = credSupport.CreateNetrc()
-                    # if retVal == 0:
-                    #     prepare_tools.downloadDefaultTools(args.force)
-                    #     credSupport.DeleteNetrc()
-
-    if args.setup:
-        setUpPythonEnv(args.pydir)
-
-    repoConfigData = configSupport.ReadConfigFile(os.path.join(repoRootDir, 'repoConfig.yaml'))
-    repoConfigMtime = os.path.getmtime(os.path.join(repoRootDir, 'repoConfig.yaml'))
-
-    recreate = False
-    if os.path.exists(WS_ENV_VAR_PATH):
-        envVarMtime = os.path.getmtime(WS_ENV_VAR_PATH)
-        if (repoConfigMtime > envVarMtime):
-            recreate = True
-
-    envVarList = InitializeWsEnv(repoRootDir, ROOT_BUILD, repoConfigData, recreate)
-    # print(f"envVarList: {envVarList}")
-    if os.path.exists(PY_VER_PATH):
-        with open(PY_VER_PATH, "r") as pyVerFd:
-            envVarList['LATEST_PYPATH'] = pyVerFd.readline().strip()
-    
-    SetupGitTemplates(repoRootDir, os.getenv('PYTHON_PATH', default=PY_DIR))
-
-    if args.credentials:
+    def setCredentials(changed: bool) -> None:
         prepare_tools.setCredentials()
         print(f"{funcName}: Credentials set successfully...")
 
-    if args.download:
+    def provisionVenv(changed: bool) -> None:
+        if args.env:
+            exists, pydir = isPythonVenvExists()
+            if not exists:
+                pydir = os.path.join(os.getenv("BUILDTOOLS_PATH_OVERRIDE"), PY_VERSION)
+                setUpPythonEnv(pydir)
+            else:
+                print(f"{funcName}: Python virtual environment already exists at {pydir}.venv, checking for updates...")
+                deployVirtualEnv(pydir)
+
+        if args.setup:
+            setUpPythonEnv(args.pydir)
+
+    def checkCredentials(changed: bool) -> bool:
+        if is_in_venv() and isPythonVenvExists()[0]: # if this script is running in the virtual environment
+            if not prepare_tools.hasValidCredentials():
+                print(f"{funcName}: Credentials not set, please set up the credentials with -c option and try again...")
+                return False
+        return True
+
+    def readConfig(changed: bool) -> None:
+        ctx['repoConfigData'] = configSupport.ReadConfigFile(repoConfigPath)
+
+    def initializeWsEnv(changed: bool) -> None:
+        # envVars.json is rebuilt when repoConfig.yaml changed since it was last written
+        with span("InitializeWsEnv", recreate=changed):
+            ctx['envVarList'] = envSupport.InitializeWsEnv(repoRootDir, ROOT_BUILD, ctx['repoConfigData'], changed)
+
+    def gitTemplateDir() -> str:
+        return os.path.join(biosCommonDefs.biosEnvSettings['DevToolsDir'], 'ags_scripts', 'python', 'GitFiles')
+
+    def gitTemplateOutputs() -> list:
+        hooksDir = os.path.join(gitTemplateDir(), 'hooks')
+        hooks = os.listdir(hooksDir) if os.path.isdir(hooksDir) else []
+        return [os.path.join(repoRootDir, '.git', 'Commit-Template.txt')] + \
+               [os.path.join(repoRootDir, '.git', 'hooks', hook) for hook in hooks]
+
+    def checkoutSubmodules(changed: bool) -> bool:
+        # Partial (blob:none), shallow and sparse checkout of the submodules, several at once
+        return CheckoutSubmodules(repoRootDir, ctx['repoConfigData'].get('SC_PATTERNS', {}), Force=args.force, Reclone=args.reclone)
+
+    def downloadTools(changed: bool) -> bool:
         # Download compilers and tools
+        retVal = prepare_tools.downloadDefaultTools(args.force)
+        if not retVal:
+            return False
+        if credSupport.CreateNetrc() != 0:
+            return False
         try:
-            retVal = prepare_tools.downloadDefaultTools(args.force)
-            if retVal:
-                retVal = credSupport.CreateNetrc()
-                if retVal == 0:
-                    retVal = DownloadCompilersTools(repoRootDir, args.force)
-                    if retVal:
-                        retVal = DownloadDpfBinPackages(envVarList)
-                    credSupport.DeleteNetrc()
-        except subprocess.CalledProcessError as e:
-            print(f"Downloading compilers and tools failed with error: {retVal}, bailing out...")
-            sys.exit(1)
-        print(f"{funcName}: Compilers and tools downloaded successfully...")
+            retVal = DownloadCompilersTools(repoRootDir, args.force)
+        finally:
+            credSupport.DeleteNetrc()
+        if retVal:
+            print(f"{funcName}: Compilers and tools downloaded successfully...")
+        return retVal
+
+    def downloadDpf(changed: bool) -> bool:
+        if downloadBaseUrl("DPF_BINARIES_LIST") is not None:
+            return True  # fetched with the other tools
+        envVarList = ctx['envVarList']
+        if os.path.exists(PY_VER_PATH):
+            with open(PY_VER_PATH, "r") as pyVerFd:
+                envVarList['LATEST_PYPATH'] = pyVerFd.readline().strip()
+        if credSupport.CreateNetrc() != 0:
+            return False
+        try:
+            return platformSupport.DownloadDpfBinPackages(envVarList) is not False
+        finally:
+            credSupport.DeleteNetrc()
 
-    if args.upload:
+    def uploadArtifact(changed: bool) -> None:
         prepare_tools.uploadArtifact(args.upload[0], args.upload[1])
 
+    # Entering credentials is interactive, everything else waits for it
+    first = ['credentials'] if args.credentials else []
+    venv = ['venv'] if (args.env or args.setup) else []
+    tasks = []
+    if args.credentials:
+        tasks.append(SetupTask('credentials', setCredentials))
+    if args.env:
+        # Invalid credentials stop the setup before any download starts
+        first = first + ['credentialCheck']
+        tasks.append(SetupTask('credentialCheck', checkCredentials, deps=first[:-1], fatal=True))
+    if venv:
+        # The tools task may replace the interpreter the venv runs on (always with --force)
+        tasks.append(SetupTask('venv', provisionVenv, deps=first + (['tools'] if args.download else [])))
+    tasks += [
+        SetupTask('config', readConfig, deps=first),
+        SetupTask('wsEnv', initializeWsEnv, deps=first + ['config'], runAlways=True,
+                  inputs=lambda: fileStamp(repoConfigPath), outputs=lambda: [WS_ENV_VAR_PATH]),
+        SetupTask('gitTemplates', lambda changed: SetupGitTemplates(repoRootDir, os.getenv('PYTHON_PATH', default=PY_DIR)),
+                  deps=first, inputs=lambda: [treeStamp(gitTemplateDir()), os.getenv('PYTHON_PATH', default=PY_DIR)],
+                  outputs=gitTemplateOutputs),
+    ]
+    if args.modules:
+        tasks.append(SetupTask('submodules', checkoutSubmodules, deps=first + ['config']))
+    if args.download:
+        # No fingerprint: the default tools fetched by prepare_tools are not known here, so the task
+        # always runs and each downloader skips what is already in place (unless --force)
+        tasks.append(SetupTask('tools', downloadTools, deps=first + ['wsEnv']))
+        # The DPF downloader reads the Python picked by a venv set up in the same run
+        tasks.append(SetupTask('dpfPackages', downloadDpf, deps=['tools', 'wsEnv'] + venv))
+    if args.upload:
+        tasks.append(SetupTask('upload', uploadArtifact, deps=first))
+
+    ok = RunTaskGraph(tasks, FingerprintStore(os.path.join(ROOT_BUILD, 'setupFingerprints.json')))
+    PrintTaskSummary(tasks, time.perf_counter() - started)
+    if not ok:
+        print(f"{funcName}: Setup failed, bailing out...")
+        sys.exit(1)
+
 
 ############################################################################
 ## Entry Point Function
 ############################################################################
 if __name__ == "__main__":
 
-    # Enable tracing (not now, but in case we need it later)
-    #sys.settrace(trace_statements)
-
     parser = ArgumentParser(description="Setup the AGS repo for build management")
     group = parser.add_mutually_exclusive_group(required=True)
 
@@ -408,14 +466,23 @@ if __name__ == "__main__":
 
     parser.add_argument("-s", "--setup", dest="setup", action="store_true", required=False, default=False, help="Setup python virtual environment and install dependencies")
     parser.add_argument("-d", "--download", dest="download", action="store_true", required=False, default=False, help="Download compilers and tools")
-    parser.add_argument("-f", "--force", dest="force", action="store_true", required=False, default=False, help="Forces the tools and compiler download")
+    parser.add_argument("-m", "--modules", dest="modules", action="store_true", required=False, default=False, help="Partial, parallel checkout of the submodules")
+    parser.add_argument("--profile", dest="profile", type=float, required=False, default=setupTrace.PROFILE_INTERVAL_MS,
+                        help="Sample all thread stacks every PROFILE milliseconds into setupRepoProfile.folded")
+    parser.add_argument("-f", "--force", dest="force", action="store_true", required=False, default=False, help="Forces the tools and compiler download (with -m also the submodule checkout, in place and not over local changes)")
+    parser.add_argument("--reclone", dest="reclone", action="store_true", required=False, default=False, help="With -m: delete the submodules and check them out from scratch, discarding local changes")
 
     args = parser.parse_args()
-    if not any([args.setup, args.download, args.credentials]) and args.pydir:
-        print("One of the options -s, -d, is required along with -p. Exiting ...")
+    if not any([args.setup, args.download, args.modules, args.credentials]) and args.pydir:
+        print("One of the options -s, -d, -m, is required along with -p. Exiting ...")
         sys.exit(1)
 
-    setupRepoInit(args)
-
-    # Disable tracing
-    sys.settrace(None)
\ No newline at end of file
+    # Phase spans always go to setupRepoTrace.json next to setupRepoPython.log; the stack sampler is opt-in
+    sampler = setupTrace.StackSampler(args.profile).start() if args.profile > 0 else None
+    try:
+        with span("setupRepoInit"):
+            setupRepoInit(args)
+    finally:
+        print(f"Setup trace: {setupTrace.WriteTrace()}")
+        if sampler is not None:
+            print(f"Setup profile: {setupTrace.WriteProfile(sampler.stop())}")
\ No newline at end of file
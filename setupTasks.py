@@ -0,0 +1,233 @@
+"""
+############################################################################
+Copyright (c) 2024 - 2025 Dell Inc. All rights reserved.
+This software and associated documentation (if any) is furnished
+under a license and may only be used or copied in accordance
+with the terms of the license. Except as permitted by such
+license, no part of this software or documentation may be
+reproduced, stored in a retrieval system, or transmitted in any
+form or by any means without the express written consent of
+Dell Inc.
+############################################################################
+"""
+############################################################################
+## Includes
+############################################################################
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, List, Optional
+
+import setupTrace
+
+############################################################################
+## Variables
+############################################################################
+# Setup tasks running at once
+SETUP_TASK_WORKERS = int(os.getenv("SETUP_TASK_WORKERS", default=4))
+
+############################################################################
+## Class Implementation
+############################################################################
+
+#
+# @brief     SetupTask
+# @details   One step of the workspace setup.
+#
+#            action(changed)  does the work; returning False (or raising, or sys.exit) fails the task
+#            deps             names of the tasks that must have succeeded (or been skipped) first
+#            inputs()         JSON-serializable description of everything the result depends on
+#                             (config sections, file stamps, versions); evaluated once the deps ran
+#            outputs()        paths the task produces
+#            runAlways        call action even when up to date; changed tells it whether anything did
+#            fatal            a failure stops the whole setup: no further task is started
+#
+#            A task with inputs is skipped when they hash as in the last successful run and all
+#            its outputs still exist. A task without inputs always runs.
+#
+class SetupTask:
+    def __init__(self, name: str, action: Callable[[bool], Any], deps: Optional[List[str]] = None,
+                 inputs: Optional[Callable[[], Any]] = None, outputs: Optional[Callable[[], List[str]]] = None,
+                 runAlways: bool = False, fatal: bool = False):
+        self.name = name
+        self.action = action
+        self.deps = deps or []
+        self.inputs = inputs
+        self.outputs = outputs
+        self.runAlways = runAlways
+        self.fatal = fatal
+        self.status = "pending"
+        self.error = None
+        self.seconds = 0.0
+
+#
+# @brief     FingerprintStore
+# @details   Hash of the inputs of every task at its last successful run, kept in one JSON file
+#
+class FingerprintStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r") as storeFd:
+                self.fingerprints = json.load(storeFd)
+        except (OSError, ValueError):
+            self.fingerprints = {}
+
+    @staticmethod
+    def digest(task: SetupTask) -> Optional[str]:
+        if task.inputs is None:
+            return None
+        return hashlib.sha256(json.dumps(task.inputs(), sort_keys=True, default=str).encode()).hexdigest()
+
+    def isUpToDate(self, task: SetupTask, digest: Optional[str]) -> bool:
+        if digest is None or self.fingerprints.get(task.name) != digest:
+            return False
+        return all(os.path.exists(path) for path in (task.outputs() if task.outputs else []))
+
+    def record(self, task: SetupTask, digest: Optional[str]) -> None:
+        if digest is None:
+            return
+        with self._lock:
+            self.fingerprints[task.name] = digest
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmpPath = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmpPath, "w") as storeFd:
+                json.dump(self.fingerprints, storeFd, indent=1, sort_keys=True)
+            os.replace(tmpPath, self.path)
+
+    def forget(self, name: str) -> None:
+        with self._lock:
+            self.fingerprints.pop(name, None)
+
+############################################################################
+## Function Implementation
+############################################################################
+
+def fileStamp(path: str) -> Optional[str]:
+    """sha256 of a file's content with line endings normalized, None if it does not exist."""
+    if not os.path.isfile(path):
+        return None
+    with open(path, "rb") as stampFd:
+        return hashlib.sha256(stampFd.read().replace(b"\r\n", b"\n")).hexdigest()
+
+
+def treeStamp(path: str) -> List[list]:
+    """Relative path, size and mtime of every file under path."""
+    stamp = []
+    for root, _, files in os.walk(path):
+        for fileName in sorted(files):
+            filePath = os.path.join(root, fileName)
+            fileStat = os.stat(filePath)
+            stamp.append([os.path.relpath(filePath, path), fileStat.st_size, fileStat.st_mtime_ns])
+    return sorted(stamp)
+
+#
+# @brief     runTask
+# @details   Run one task unless its fingerprint says it is up to date
+#
+def runTask(task: SetupTask, store: Optional[FingerprintStore]) -> None:
+    with setupTrace.span(task.name, "task") as traceArgs:
+        runTaskAction(task, store)
+        traceArgs.update(status=task.status, error=task.error)
+
+
+def runTaskAction(task: SetupTask, store: Optional[FingerprintStore]) -> None:
+    started = time.perf_counter()
+    try:
+        digest = FingerprintStore.digest(task) if store is not None else None
+        changed = not (store is not None and store.isUpToDate(task, digest))
+        if not changed and not task.runAlways:
+            task.status = "skipped"
+        else:
+            result = task.action(changed)
+            if result is False:
+                task.status = "failed"
+                task.error = "returned False"
+            else:
+                task.status = "done"
+                if store is not None:
+                    store.record(task, digest)
+    except SystemExit as e:
+        task.status = "failed"
+        task.error = f"exit code {e.code}"
+    except Exception as e:
+        task.status = "failed"
+        task.error = f"{type(e).__name__}: {e}"
+    if task.status == "failed" and store is not None:
+        store.forget(task.name)
+    task.seconds = time.perf_counter() - started
+
+#
+# @brief     RunTaskGraph
+# @details   Run tasks as soon as all their deps succeeded, up to workers at once. Tasks whose
+#            deps failed are not run ("blocked"); the others still are, unless a fatal task
+#            failed: then nothing else is started. Returns True if no task failed or was blocked.
+#
+# @param tasks   SetupTask list, in any order
+# @param store   Optional FingerprintStore; without it every task runs
+# @param workers Tasks running at once
+#
+def RunTaskGraph(tasks: List[SetupTask], store: Optional[FingerprintStore] = None,
+                 workers: int = SETUP_TASK_WORKERS) -> bool:
+    byName = {task.name: task for task in tasks}
+    for task in tasks:
+        unknown = [dep for dep in task.deps if dep not in byName]
+        if unknown:
+            raise ValueError(f"task {task.name} depends on unknown task(s) {unknown}")
+
+    finished = {"done", "skipped"}
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="setup") as pool:
+        while True:
+            progress = True
+            while progress:
+                progress = False
+                for task in tasks:
+                    if task.status != "pending":
+                        continue
+                    depStatus = [byName[dep].status for dep in task.deps]
+                    # Checked per task: a running fatal task may fail at any point of this pass
+                    stoppedBy = [other.name for other in tasks if other.fatal and other.status == "failed"]
+                    if stoppedBy:
+                        task.status = "blocked"
+                        task.error = "setup stopped: " + ", ".join(stoppedBy) + " failed"
+                    elif any(status in ("failed", "blocked") for status in depStatus):
+                        task.status = "blocked"
+                        task.error = "dependency failed: " + ", ".join(
+                            dep for dep in task.deps if byName[dep].status in ("failed", "blocked"))
+                        progress = True
+                    elif all(status in finished for status in depStatus):
+                        task.status = "running"
+                        running[pool.submit(runTask, task, store)] = task
+            if not running:
+                break
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                running.pop(future)
+
+    # Whatever is still pending waits on itself through a cycle
+    for task in tasks:
+        if task.status == "pending":
+            task.status = "blocked"
+            task.error = "dependency cycle"
+    return all(task.status in finished for task in tasks)
+
+#
+# @brief     PrintTaskSummary
+# @details   One line per task with its status and wall time, then every failure with its reason
+#
+def PrintTaskSummary(tasks: List[SetupTask], totalSeconds: Optional[float] = None) -> None:
+    print("Setup summary:")
+    for task in tasks:
+        print(f"  [{task.status:>7}] {task.name:<16} {task.seconds:7.2f}s")
+    for task in tasks:
+        if task.error:
+            print(f"  {task.status.upper()} {task.name}: {task.error}")
+    if totalSeconds is not None:
+        print(f"Setup finished in {totalSeconds:.2f}s")
+    sys.stdout.flush()
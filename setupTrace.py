@@ -0,0 +1,172 @@
+"""
+############################################################################
+Copyright (c) 2024 - 2025 Dell Inc. All rights reserved.
+This software and associated documentation (if any) is furnished
+under a license and may only be used or copied in accordance
+with the terms of the license. Except as permitted by such
+license, no part of this software or documentation may be
+reproduced, stored in a retrieval system, or transmitted in any
+form or by any means without the express written consent of
+Dell Inc.
+############################################################################
+"""
+############################################################################
+## Includes
+############################################################################
+import os
+import sys
+import json
+import time
+import functools
+import threading
+import subprocess
+from collections import Counter
+from contextlib import contextmanager
+from typing import Optional
+
+############################################################################
+## Variables
+############################################################################
+# Written next to setupRepoPython.log; open with chrome://tracing or https://ui.perfetto.dev
+TRACE_NAME = "setupRepoTrace.json"
+# Folded stacks of the sampler (flamegraph.pl / speedscope input)
+PROFILE_NAME = "setupRepoProfile.folded"
+
+# Sampling period of the optional stack sampler; 0 keeps it off
+PROFILE_INTERVAL_MS = float(os.getenv("SETUP_PROFILE_INTERVAL_MS", default=0))
+
+_events = []
+_eventsLock = threading.Lock()
+_threadNames = {}
+_origin = time.perf_counter()
+
+############################################################################
+## Class Implementation
+############################################################################
+
+#
+# @brief     StackSampler
+# @details   Samples the stacks of all threads every intervalMs and counts them as folded
+#            stacks. Unlike a sys.settrace hook it costs nothing between samples, so it can
+#            stay on for whole setups on slow agents.
+#
+class StackSampler:
+    def __init__(self, intervalMs: float):
+        self.interval = intervalMs / 1000.0
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="setup-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        ownId = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for threadId, frame in sys._current_frames().items():
+                if threadId == ownId:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(threadId, str(threadId)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+############################################################################
+## Function Implementation
+############################################################################
+
+def _now() -> float:
+    # Trace timestamps are microseconds
+    return (time.perf_counter() - _origin) * 1e6
+
+
+def _record(event: dict) -> None:
+    thread = threading.current_thread()
+    event.update(pid=os.getpid(), tid=thread.ident)
+    with _eventsLock:
+        _threadNames[thread.ident] = thread.name
+        _events.append(event)
+
+#
+# @brief     span
+# @details   Time the with-block as one trace event. The yielded dict is stored as the event's
+#            args, so the block can add results (bytes, return codes) to it.
+#
+@contextmanager
+def span(name: str, cat: str = "setup", **args):
+    started = _now()
+    try:
+        yield args
+    except BaseException as e:
+        args["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _record({"name": name, "cat": cat, "ph": "X", "ts": started, "dur": _now() - started, "args": args})
+
+#
+# @brief     traced
+# @details   Decorator form of span, named after the function unless a name is given
+#
+def traced(name: Optional[str] = None, cat: str = "setup"):
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name or func.__name__, cat):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def counter(name: str, **values) -> None:
+    """Counter track in the trace (e.g. download throughput)."""
+    _record({"name": name, "cat": "counter", "ph": "C", "ts": _now(), "args": values})
+
+#
+# @brief     run
+# @details   subprocess.run inside a span named after the command, with its return code
+#
+def run(cmd, **kwargs) -> subprocess.CompletedProcess:
+    words = cmd if isinstance(cmd, (list, tuple)) else [cmd]
+    label = " ".join(os.path.basename(str(word)) if index == 0 else str(word) for index, word in enumerate(words[:3]))
+    with span(label, "subprocess", cmd=" ".join(str(word) for word in words)) as args:
+        result = subprocess.run(cmd, **kwargs)
+        args["returncode"] = result.returncode
+    return result
+
+
+def tracePath() -> str:
+    return os.path.join(os.getenv("BUILDTOOLS_PATH_OVERRIDE", default="."), TRACE_NAME)
+
+#
+# @brief     WriteTrace
+# @details   Write all events recorded so far as a Chrome trace-event JSON file
+#
+def WriteTrace(path: Optional[str] = None) -> str:
+    path = path or tracePath()
+    with _eventsLock:
+        events = list(_events)
+        threadNames = dict(_threadNames)
+    metadata = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": threadId, "args": {"name": threadName}}
+                for threadId, threadName in threadNames.items()]
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as traceFd:
+        json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, traceFd)
+    return path
+
+
+def WriteProfile(samples: Counter, path: Optional[str] = None) -> str:
+    path = path or os.path.join(os.path.dirname(tracePath()), PROFILE_NAME)
+    with open(path, "w") as profileFd:
+        for stack, count in samples.most_common():
+            profileFd.write(f"{stack} {count}\n")
+    return path
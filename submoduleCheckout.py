@@ -0,0 +1,267 @@
+"""
+############################################################################
+Copyright (c) 2024 - 2025 Dell Inc. All rights reserved.
+This software and associated documentation (if any) is furnished
+under a license and may only be used or copied in accordance
+with the terms of the license. Except as permitted by such
+license, no part of this software or documentation may be
+reproduced, stored in a retrieval system, or transmitted in any
+form or by any means without the express written consent of
+Dell Inc.
+############################################################################
+"""
+############################################################################
+## Includes
+############################################################################
+import os
+import sys
+import time
+import shutil
+import subprocess
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import setupTrace
+
+############################################################################
+## Variables
+############################################################################
+# Submodules checked out at once
+SUBMODULE_JOBS = int(os.getenv("SETUP_SUBMODULE_JOBS", default=4))
+
+# Per-module sparse patterns: sparse-checkout-base-<module directory name>.txt in the workspace root,
+# else the SC_PATTERNS entry of repoConfig.yaml with that name; modules without either are checked out in full
+SPARSE_FILE_FORMAT = "sparse-checkout-base-{}.txt"
+
+# Commit last checked out by this script, kept in each submodule so later runs can tell local commits apart
+CHECKOUT_REF = "refs/setup/checkout"
+
+############################################################################
+## Class Implementation
+############################################################################
+
+#
+# @brief     Submodule
+# @details   One .gitmodules entry, the commit recorded for it and the outcome of its checkout
+#
+class Submodule:
+    def __init__(self, name: str):
+        self.name = name
+        self.path = None
+        self.url = None
+        self.branch = None
+        self.commit = None
+        self.patterns = None
+        self.status = "pending"
+        self.error = None
+        self.seconds = 0.0
+
+############################################################################
+## Function Implementation
+############################################################################
+
+def runGit(args: List[str], cwd: str) -> str:
+    result = setupTrace.run(["git"] + args, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"git {' '.join(args)} failed with returncode={result.returncode}: {result.stderr.strip()}")
+    return result.stdout.strip()
+
+#
+# @brief     readSubmodules
+# @details   Submodules from .gitmodules, with the commit the superproject records for each
+#
+def readSubmodules(wsDir: str, scPatterns: Optional[Dict[str, List[str]]] = None) -> List[Submodule]:
+    modules = {}
+    output = runGit(["config", "-f", ".gitmodules", "--get-regexp", r"^submodule\..*\.(path|url|branch)$"], wsDir)
+    for line in output.splitlines():
+        key, value = line.split(" ", 1)
+        name, field = key[len("submodule."):].rsplit(".", 1)
+        setattr(modules.setdefault(name, Submodule(name)), field, value.strip())
+
+    for module in modules.values():
+        treeEntry = runGit(["ls-tree", "HEAD", "--", module.path], wsDir)
+        if treeEntry:
+            module.commit = treeEntry.split()[2]
+        module.patterns = sparsePatterns(wsDir, module, scPatterns or {})
+    return list(modules.values())
+
+
+def sparsePatterns(wsDir: str, module: Submodule, scPatterns: Dict[str, List[str]]) -> Optional[List[str]]:
+    moduleName = os.path.basename(module.path)
+    sparseFile = os.path.join(wsDir, SPARSE_FILE_FORMAT.format(moduleName))
+    if os.path.exists(sparseFile):
+        with open(sparseFile, "r") as sparseFd:
+            return [line.strip() for line in sparseFd if line.strip()]
+    return scPatterns.get(moduleName)
+
+#
+# @brief     localChanges
+# @details   Why a populated submodule must not be checked out again, None if nothing would be lost:
+#            uncommitted changes, or commits that are neither on a remote branch nor the commit
+#            this script checked out last
+#
+def localChanges(workTree: str) -> Optional[str]:
+    if runGit(["status", "--porcelain"], workTree):
+        return "uncommitted changes"
+    known = ["--remotes"]
+    if runGit(["for-each-ref", CHECKOUT_REF], workTree):
+        known.append(CHECKOUT_REF)
+    localCommits = runGit(["rev-list", "-n", "1", "HEAD", "--branches", "--not"] + known, workTree)
+    if localCommits:
+        return f"local commit {localCommits[:12]}"
+    return None
+
+#
+# @brief     checkoutSubmodule
+# @details   Partial, shallow checkout of one submodule:
+#            1. git init with the git dir under .git/modules/<name>, as git submodule lays it out
+#            2. origin as a promisor remote with the blob:none filter, so blobs are fetched on demand
+#            3. sparse patterns written before anything is checked out
+#            4. fetch of the recorded commit only (depth 1), then a detached checkout of it
+#
+#            A populated submodule is left as is, unless force: then the sparse patterns are written
+#            again and the recorded commit is checked out in place (3 and 4). That is refused when
+#            it has uncommitted changes or local commits. reclone deletes the submodule and its
+#            git dir and starts over at 1, discarding anything local.
+#
+def checkoutSubmodule(wsDir: str, superGitDir: str, module: Submodule, force: bool = False,
+                      reclone: bool = False) -> None:
+    workTree = os.path.join(wsDir, module.path)
+    gitDir = os.path.join(superGitDir, "modules", module.name)
+    if os.path.exists(os.path.join(workTree, ".git")) and not reclone:
+        if not force:
+            module.status = "present"
+            return
+        reason = localChanges(workTree)
+        if reason:
+            raise RuntimeError(f"{reason}, not checked out again (--reclone discards them)")
+        writeSparsePatterns(workTree, gitDir, module)
+        checkoutRecordedCommit(workTree, module)
+        module.status = "updated"
+        return
+    shutil.rmtree(gitDir, ignore_errors=True)
+    shutil.rmtree(workTree, ignore_errors=True)
+    os.makedirs(workTree)
+    os.makedirs(os.path.dirname(gitDir), exist_ok=True)
+
+    runGit(["init", "--quiet", f"--separate-git-dir={gitDir}", workTree], wsDir)
+    # Relative links, like git submodule writes them, so the workspace can be moved
+    with open(os.path.join(workTree, ".git"), "w") as gitFileFd:
+        gitFileFd.write(f"gitdir: {os.path.relpath(gitDir, workTree).replace(os.sep, '/')}\n")
+    runGit(["config", "core.worktree", os.path.relpath(workTree, gitDir).replace(os.sep, "/")], workTree)
+
+    runGit(["remote", "add", "origin", module.url], workTree)
+    runGit(["config", "remote.origin.promisor", "true"], workTree)
+    runGit(["config", "remote.origin.partialclonefilter", "blob:none"], workTree)
+
+    writeSparsePatterns(workTree, gitDir, module)
+    checkoutRecordedCommit(workTree, module)
+    module.status = "done"
+
+
+def writeSparsePatterns(workTree: str, gitDir: str, module: Submodule) -> None:
+    sparseFile = os.path.join(gitDir, "info", "sparse-checkout")
+    if not module.patterns:
+        if os.path.exists(sparseFile):
+            # Was checked out sparse: bring back every file
+            runGit(["sparse-checkout", "disable"], workTree)
+        return
+    runGit(["config", "core.sparseCheckout", "true"], workTree)
+    runGit(["config", "core.sparseCheckoutCone", "false"], workTree)
+    os.makedirs(os.path.dirname(sparseFile), exist_ok=True)
+    with open(sparseFile, "w") as sparseFd:
+        sparseFd.write("\n".join(module.patterns) + "\n")
+
+
+def checkoutRecordedCommit(workTree: str, module: Submodule) -> None:
+    target = module.commit or f"origin/{module.branch or 'HEAD'}"
+    if module.commit:
+        try:
+            runGit(["fetch", "--quiet", "--no-tags", "--filter=blob:none", "--depth", "1", "origin", module.commit],
+                   workTree)
+        except RuntimeError:
+            # Server does not serve commits by id; fetch the branch history (still without blobs)
+            runGit(["fetch", "--quiet", "--no-tags", "--filter=blob:none", "origin"], workTree)
+    else:
+        runGit(["fetch", "--quiet", "--no-tags", "--filter=blob:none", "--depth", "1", "origin",
+                module.branch or "HEAD"], workTree)
+        target = "FETCH_HEAD"
+    runGit(["checkout", "--quiet", "--detach", target], workTree)
+    # Apply the sparse patterns to files the checkout did not touch as well
+    runGit(["read-tree", "-mu", "HEAD"], workTree)
+    runGit(["update-ref", CHECKOUT_REF, "HEAD"], workTree)
+
+#
+# @brief     CheckoutSubmodules
+# @details   Initialize and check out every submodule of the workspace in parallel, partial
+#            (blob:none), shallow and sparse. Failures are collected and reported together.
+#
+# @param WsDir      Workspace root (superproject)
+# @param ScPatterns SC_PATTERNS from repoConfig.yaml
+# @param Jobs       Submodules checked out at once
+# @param Force      True: check out the recorded commit again in populated submodules, in place;
+#                   refused for a submodule with uncommitted changes or local commits
+# @param Reclone    True: delete populated submodules and check them out from scratch, discarding
+#                   local changes
+#
+def CheckoutSubmodules(WsDir: str, ScPatterns: Optional[Dict[str, List[str]]] = None, Jobs: int = SUBMODULE_JOBS,
+                       Force: bool = False, Reclone: bool = False) -> bool:
+    started = time.perf_counter()
+    modules = readSubmodules(WsDir, ScPatterns)
+    if not modules:
+        return True
+    superGitDir = os.path.abspath(os.path.join(WsDir, runGit(["rev-parse", "--git-dir"], WsDir)))
+
+    # One serial init: resolves relative URLs against the superproject remote and
+    # writes .git/config, which parallel jobs would contend for
+    runGit(["submodule", "init", "--"] + [module.path for module in modules], WsDir)
+    for module in modules:
+        module.url = runGit(["config", f"submodule.{module.name}.url"], WsDir)
+
+    def checkout(module: Submodule) -> None:
+        moduleStarted = time.perf_counter()
+        try:
+            checkoutSubmodule(WsDir, superGitDir, module, Force, Reclone)
+        except Exception as e:
+            module.status = "failed"
+            module.error = str(e)
+        module.seconds = time.perf_counter() - moduleStarted
+        print(f"{module.path}: {module.status} in {module.seconds:.1f}s")
+        sys.stdout.flush()
+
+    with ThreadPoolExecutor(max_workers=Jobs, thread_name_prefix="submodule") as pool:
+        list(pool.map(checkout, modules))
+
+    failed = [module for module in modules if module.status == "failed"]
+    for module in failed:
+        print(f"  FAILED {module.path} ({module.url}): {module.error}")
+    print(f"{len(modules) - len(failed)}/{len(modules)} submodules checked out in {time.perf_counter() - started:.1f}s")
+    return not failed
+
+
+############################################################################
+## Entry Point Function
+############################################################################
+if __name__ == "__main__":
+    # Time a checkout, e.g. against local bare repos (allow uploadpack.allowFilter and
+    # uploadpack.allowAnySHA1InWant on them), optionally after a plain serial checkout for comparison
+    parser = ArgumentParser(description="Partial, parallel checkout of the workspace submodules")
+    parser.add_argument("-w", "--workspace", dest="workspace", default=os.getcwd(), help="Workspace root")
+    parser.add_argument("-j", "--jobs", dest="jobs", type=int, default=SUBMODULE_JOBS, help="Submodules checked out at once")
+    parser.add_argument("-f", "--force", dest="force", action="store_true", default=False,
+                        help="Check out the recorded commit again in populated submodules, unless they have local changes")
+    parser.add_argument("--reclone", dest="reclone", action="store_true", default=False,
+                        help="Delete populated submodules and check them out from scratch, discarding local changes")
+    parser.add_argument("--baseline", dest="baseline", action="store_true", default=False,
+                        help="Run a full serial 'git submodule update --init' instead, for comparison")
+    args = parser.parse_args()
+
+    benchStarted = time.perf_counter()
+    if args.baseline:
+        runGit(["-c", "protocol.file.allow=always", "submodule", "update", "--init"], args.workspace)
+        ok = True
+    else:
+        ok = CheckoutSubmodules(args.workspace, Jobs=args.jobs, Force=args.force, Reclone=args.reclone)
+    print(f"Checkout time: {time.perf_counter() - benchStarted:.1f}s")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,235 @@
+"""
+Tests of downloadScheduler against a local HTTP stand-in for Artifactory:
+resume of a dropped download, retry on 503, no retry on 404, checksum failures,
+and the artifact cache (stale or damaged entries, --force).
+"""
+import os
+import sys
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import downloadScheduler
+from artifactCache import ArtifactCache
+from downloadScheduler import DownloadJob, RunDownloads
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="the stand-in 7z is a script with a shebang")
+
+PAYLOAD = os.urandom(3 * 1024 * 1024 + 17)
+PAYLOAD_SHA256 = hashlib.sha256(PAYLOAD).hexdigest()
+
+#
+# @brief     ArtifactHandler
+# @details   /ok      the payload, with Range support and the checksum header
+#            /drop    the first response closes the connection halfway through the body
+#            /flaky   503 twice, then the payload
+#            /missing 404
+#            /corrupt the payload with a wrong checksum header
+#            HEAD requests get the headers of /ok; server.payload is what /ok serves
+#
+class ArtifactHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def sendArtifactHeaders(self, name, body):
+        payload = self.server.payload
+        sha256 = hashlib.sha256(payload).hexdigest()
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header(downloadScheduler.CHECKSUM_HEADER, "0" * 64 if name == "corrupt" else sha256)
+        self.send_header("ETag", f'"{sha256[:16]}"')
+        self.end_headers()
+
+    def do_HEAD(self):
+        name = self.path.strip("/").split(".")[0]
+        with self.server.countLock:
+            self.server.heads += 1
+        self.send_response(200)
+        self.sendArtifactHeaders(name, self.server.payload)
+
+    def do_GET(self):
+        name = self.path.strip("/").split(".")[0]
+        with self.server.countLock:
+            self.server.requests[name] = self.server.requests.get(name, 0) + 1
+            count = self.server.requests[name]
+        self.server.ranges.append((name, self.headers.get("Range")))
+
+        if name == "missing":
+            self.send_error(404)
+            return
+        if name == "flaky" and count <= 2:
+            self.send_error(503)
+            return
+
+        payload = self.server.payload
+        start = 0
+        rangeHeader = self.headers.get("Range")
+        if rangeHeader:
+            start = int(rangeHeader.split("=")[1].split("-")[0])
+        body = payload[start:]
+        self.send_response(206 if start else 200)
+        if start:
+            self.send_header("Content-Range", f"bytes {start}-{len(payload) - 1}/{len(payload)}")
+        self.sendArtifactHeaders(name, body)
+        if name == "drop" and count == 1:
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ArtifactHandler)
+    httpd.payload = PAYLOAD
+    httpd.requests = {}
+    httpd.ranges = []
+    httpd.heads = 0
+    httpd.countLock = threading.Lock()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def sevenZip(tmp_path):
+    """Stand-in for 7z: 'extracts' an archive by copying it to payload.bin in the output directory."""
+    script = tmp_path / "7z"
+    script.write_text(f"#!{sys.executable}\n"
+                      "import os, shutil, sys\n"
+                      "out = next(arg[2:] for arg in sys.argv if arg.startswith('-o'))\n"
+                      "os.makedirs(out)\n"
+                      "shutil.copy(sys.argv[-1], os.path.join(out, 'payload.bin'))\n")
+    script.chmod(0o755)
+    return str(script)
+
+
+@pytest.fixture(autouse=True)
+def fastBackoff(monkeypatch):
+    monkeypatch.setattr(downloadScheduler, "BACKOFF_SECONDS", 0.01)
+
+
+def download(server, tmp_path, sevenZip, name, sha256=None, cache=None, override=False, outName=None):
+    url = f"http://127.0.0.1:{server.server_address[1]}/{name}.7z"
+    job = DownloadJob("TEST", name, url, str(tmp_path / "out" / (outName or name)), sha256)
+    RunDownloads([job], str(tmp_path / "downloads"), override, sevenZip=sevenZip, cache=cache)
+    return job
+
+
+def extracted(job):
+    with open(os.path.join(job.outDir, "payload.bin"), "rb") as payloadFd:
+        return payloadFd.read()
+
+
+def testDownloadAndExtract(server, tmp_path, sevenZip):
+    job = download(server, tmp_path, sevenZip, "ok", PAYLOAD_SHA256)
+    assert job.status == "done", job.error
+    assert job.attempts == 1
+    assert extracted(job) == PAYLOAD
+    assert os.listdir(tmp_path / "downloads") == []
+
+
+def testResumeAfterDroppedConnection(server, tmp_path, sevenZip):
+    job = download(server, tmp_path, sevenZip, "drop")
+    assert job.status == "done", job.error
+    assert job.attempts == 2
+    assert job.resumedFrom == len(PAYLOAD) // 2
+    assert server.ranges == [("drop", None), ("drop", f"bytes={len(PAYLOAD) // 2}-")]
+    assert extracted(job) == PAYLOAD
+
+
+def testRetryOn503(server, tmp_path, sevenZip):
+    job = download(server, tmp_path, sevenZip, "flaky")
+    assert job.status == "done", job.error
+    assert job.attempts == 3
+    assert extracted(job) == PAYLOAD
+
+
+def test404IsNotRetried(server, tmp_path, sevenZip):
+    job = download(server, tmp_path, sevenZip, "missing")
+    assert job.status == "failed"
+    assert job.attempts == 1
+    assert "HTTP 404" in job.error
+    assert not os.path.exists(job.outDir)
+
+
+def testServerChecksumMismatch(server, tmp_path, sevenZip):
+    job = download(server, tmp_path, sevenZip, "corrupt")
+    assert job.status == "failed"
+    assert job.attempts == downloadScheduler.DOWNLOAD_ATTEMPTS
+    assert "sha256 mismatch" in job.error
+    # A corrupt partial file is never resumed
+    assert all(rangeHeader is None for _, rangeHeader in server.ranges)
+    assert os.listdir(tmp_path / "downloads") == []
+    assert not os.path.exists(job.outDir)
+
+
+def testConfiguredChecksumWins(server, tmp_path, sevenZip):
+    job = download(server, tmp_path, sevenZip, "ok", "f" * 64)
+    assert job.status == "failed"
+    assert "sha256 mismatch" in job.error
+
+
+def testCachedToolIsLinked(server, tmp_path, sevenZip):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    assert download(server, tmp_path, sevenZip, "ok", cache=cache).status == "done"
+    job = download(server, tmp_path, sevenZip, "ok", cache=cache, outName="second")
+    assert job.status == "cached", job.error
+    assert server.requests["ok"] == 1
+    assert server.heads == 1
+    assert extracted(job) == PAYLOAD
+
+
+def testStaleCacheEntryIsDownloadedAgain(server, tmp_path, sevenZip):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    assert download(server, tmp_path, sevenZip, "ok", cache=cache).status == "done"
+    # Same URL, new content on the server
+    server.payload = PAYLOAD[::-1]
+    job = download(server, tmp_path, sevenZip, "ok", cache=cache, outName="second")
+    assert job.status == "done", job.error
+    assert server.requests["ok"] == 2
+    assert extracted(job) == server.payload
+
+
+def damage(job):
+    payloadPath = os.path.join(job.outDir, "payload.bin")
+    os.chmod(payloadPath, 0o644)
+    with open(payloadPath, "r+b") as payloadFd:
+        payloadFd.write(b"damaged")
+
+
+def testCachedFilesAreReadOnly(server, tmp_path, sevenZip):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    job = download(server, tmp_path, sevenZip, "ok", cache=cache)
+    assert job.status == "done", job.error
+    assert os.stat(os.path.join(job.outDir, "payload.bin")).st_mode & 0o222 == 0
+
+
+def testDamagedCacheTreeIsDownloadedAgain(server, tmp_path, sevenZip):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    damage(download(server, tmp_path, sevenZip, "ok", cache=cache))
+    job = download(server, tmp_path, sevenZip, "ok", cache=cache, outName="second")
+    assert job.status == "done", job.error
+    assert server.requests["ok"] == 2
+    assert extracted(job) == PAYLOAD
+    assert download(server, tmp_path, sevenZip, "ok", cache=cache, outName="third").status == "cached"
+
+
+def testForceBypassesTheCache(server, tmp_path, sevenZip):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    first = download(server, tmp_path, sevenZip, "ok", cache=cache)
+    # A damaged cached tree (e.g. a tool file made writable and edited through its hardlink)
+    # is repaired by --force
+    damage(first)
+    job = download(server, tmp_path, sevenZip, "ok", cache=cache, override=True)
+    assert job.status == "done", job.error
+    assert server.requests["ok"] == 2
+    assert server.heads == 0
+    assert extracted(job) == PAYLOAD
+    assert download(server, tmp_path, sevenZip, "ok", cache=cache, outName="second").status == "cached"
+    assert extracted(job) == PAYLOAD
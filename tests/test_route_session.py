@@ -0,0 +1,125 @@
+"""
+Tests of the multi-stop solver and of planning sessions on the bundled
+reference data: capacity of solved and inserted routes, the drift re-solve,
+and reference data hot reload.
+"""
+import os
+import shutil
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from route_benchmark import generate_orders
+from route_data import DATA_DIR, SOURCES, ReferenceDataManager, get_reference_data
+from route_distance import get_distance_matrix
+from route_session import PlanningSession
+from route_vrp import solve_vrp
+
+
+@pytest.fixture(scope="module")
+def ref():
+    return get_reference_data()
+
+
+@pytest.fixture(scope="module")
+def distances():
+    return get_distance_matrix()
+
+
+def route_loads(session):
+    return [(route.load, session.capacities[route.truck]) for route in session.routes]
+
+
+def test_solve_vrp_visits_every_stop_within_capacity():
+    rng = np.random.default_rng(0)
+    points = rng.uniform(0, 100, size=(13, 2))
+    dist = np.linalg.norm(points[:, None] - points[None, :], axis=-1)
+    # Depot first in dist; demands and routes index the 12 stops after it
+    demands = rng.uniform(1, 10, size=12)
+
+    routes, stats = solve_vrp(dist, demands, 20.0, time_budget_ms=200)
+
+    assert sorted(stop for route in routes for stop in route) == list(range(12))
+    assert all(demands[route].sum() <= 20.0 for route in routes)
+    assert stats["elapsed_ms"] <= 1000
+
+
+def test_insertion_respects_capacity(ref, distances):
+    session = PlanningSession(generate_orders(50, ref, seed=1), ref, distances, time_budget_ms=100, max_drift=0)
+
+    assigned, errors, reoptimized = session.add(generate_orders(200, ref, seed=2))
+
+    assert not errors and not reoptimized
+    assert len(assigned) == 200
+    assert all(load <= capacity + 1e-6 for load, capacity in route_loads(session))
+    placed = sorted(line for route in session.routes for stop in route.stops for line in stop.lines)
+    assert placed == sorted(session.lines)
+
+
+def count_solves(session):
+    solves = []
+    solve = session._solve
+    session._solve = lambda budget: solves.append(budget) or solve(budget)
+    return solves
+
+
+def test_drift_past_threshold_resolves(ref, distances):
+    session = PlanningSession(generate_orders(50, ref, seed=5), ref, distances, time_budget_ms=100, max_drift=0.5)
+    solves = count_solves(session)
+    # As if the last solve had been half as long per kg of load as the plan is now
+    session.solved_km_per_kg = session._km_per_kg() / 2
+
+    _, _, reoptimized = session.add(generate_orders(1, ref, seed=6))
+
+    assert reoptimized
+    assert solves == [100]
+    assert session.drift() == 0.0
+    assert all(load <= capacity + 1e-6 for load, capacity in route_loads(session))
+
+
+def test_drift_below_threshold_keeps_plan(ref, distances):
+    session = PlanningSession(generate_orders(50, ref, seed=5), ref, distances, time_budget_ms=100, max_drift=1e6)
+    solves = count_solves(session)
+
+    _, _, reoptimized = session.add(generate_orders(20, ref, seed=6))
+
+    assert not reoptimized
+    assert not solves
+
+
+@pytest.fixture
+def data_copy(tmp_path):
+    for filename in SOURCES.values():
+        shutil.copy(os.path.join(DATA_DIR, filename), tmp_path / filename)
+    return tmp_path
+
+
+def test_reload_ignores_touched_but_identical_files(data_copy):
+    manager = ReferenceDataManager(str(data_copy), interval=0)
+    version = manager.get().version
+    orders = data_copy / SOURCES["orders"]
+    os.utime(orders, (os.path.getatime(orders), os.path.getmtime(orders) + 10))
+
+    assert not manager.check()
+    assert manager.get().version == version
+    assert manager.reloads == 0
+    # The new stamps are remembered, the next poll does not hash the files again
+    assert not manager._changed(manager.stamps)
+
+
+def test_reload_swaps_in_changed_files(data_copy):
+    manager = ReferenceDataManager(str(data_copy), interval=0)
+    before = manager.get()
+    orders = data_copy / SOURCES["orders"]
+    with open(orders, "r", newline="") as ordersFd:
+        lines = ordersFd.readlines()
+    with open(orders, "w", newline="") as ordersFd:
+        ordersFd.writelines(lines[:-1])
+
+    assert manager.check()
+    assert manager.get() is not before
+    assert manager.get().version != before.version
+    assert len(manager.get().orders) == len(before.orders) - 1
+    assert manager.reloads == 1
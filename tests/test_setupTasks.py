@@ -0,0 +1,76 @@
+"""
+Tests of the setup task graph: dependents of a failed task are blocked, a
+failed fatal task stops the run, and fingerprints skip up-to-date tasks.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from setupTasks import FingerprintStore, RunTaskGraph, SetupTask
+
+
+def testFailedTaskBlocksDependents():
+    ran = []
+    tasks = [
+        SetupTask("venv", lambda changed: False),
+        SetupTask("tools", lambda changed: ran.append("tools")),
+        SetupTask("dpf", lambda changed: ran.append("dpf"), deps=["venv", "tools"]),
+        SetupTask("upload", lambda changed: ran.append("upload"), deps=["dpf"]),
+    ]
+
+    assert not RunTaskGraph(tasks, workers=2)
+    assert ran == ["tools"]
+    status = {task.name: (task.status, task.error) for task in tasks}
+    assert status["venv"] == ("failed", "returned False")
+    assert status["tools"] == ("done", None)
+    assert status["dpf"] == ("blocked", "dependency failed: venv")
+    assert status["upload"] == ("blocked", "dependency failed: dpf")
+
+
+def testFatalTaskStopsSetup():
+    ran = []
+
+    def credentialCheck(changed):
+        time.sleep(0.05)
+        sys.exit(1)
+
+    tasks = [
+        SetupTask("credentialCheck", credentialCheck, fatal=True),
+        SetupTask("wsEnv", lambda changed: time.sleep(0.3)),
+        SetupTask("config", lambda changed: ran.append("config"), deps=["wsEnv"]),
+        SetupTask("tools", lambda changed: ran.append("tools"), deps=["credentialCheck"]),
+    ]
+
+    assert not RunTaskGraph(tasks, workers=2)
+    # wsEnv was already running and finishes; nothing starts after the check failed
+    assert ran == []
+    status = {task.name: (task.status, task.error) for task in tasks}
+    assert status["credentialCheck"] == ("failed", "exit code 1")
+    assert status["wsEnv"] == ("done", None)
+    assert status["config"] == ("blocked", "setup stopped: credentialCheck failed")
+    assert status["tools"] == ("blocked", "setup stopped: credentialCheck failed")
+
+
+def testFingerprintSkipsUpToDateTask(tmp_path):
+    output = tmp_path / "out"
+    config = {"version": 1}
+    runs = []
+
+    def action(changed):
+        runs.append(changed)
+        output.write_text("built")
+
+    def run():
+        store = FingerprintStore(str(tmp_path / "fingerprints.json"))
+        task = SetupTask("build", action, inputs=lambda: config, outputs=lambda: [str(output)])
+        assert RunTaskGraph([task], store)
+        return task.status
+
+    assert run() == "done"
+    assert run() == "skipped"
+    config["version"] = 2
+    assert run() == "done"
+    output.unlink()
+    assert run() == "done"
+    assert runs == [True, True, True]
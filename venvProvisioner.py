@@ -0,0 +1,168 @@
+"""
+############################################################################
+Copyright (c) 2024 - 2025 Dell Inc. All rights reserved.
+This software and associated documentation (if any) is furnished
+under a license and may only be used or copied in accordance
+with the terms of the license. Except as permitted by such
+license, no part of this software or documentation may be
+reproduced, stored in a retrieval system, or transmitted in any
+form or by any means without the express written consent of
+Dell Inc.
+############################################################################
+"""
+############################################################################
+## Includes
+############################################################################
+import os
+import re
+import sys
+import glob
+import json
+import time
+import hashlib
+import platform
+from typing import Dict, List, Optional
+
+import setupTrace
+from artifactCache import FileLock
+
+############################################################################
+## Variables
+############################################################################
+# Written into the venv once provisioning succeeded; a matching stamp skips pip entirely
+STAMP_NAME = ".provision_stamp.json"
+
+# Local wheel directory: when set, packages are installed from it without contacting the index.
+# It is filled from the index on first use, under a lock, so several venvs can share it.
+WHEELHOUSE_DIR = os.getenv("SETUP_WHEELHOUSE", default=None)
+
+############################################################################
+## Function Implementation
+############################################################################
+
+def venvPython(venvPath: str) -> str:
+    if platform.system() == "Windows":
+        return os.path.join(venvPath, "Scripts", "python.exe")
+    return os.path.join(venvPath, "bin", "python")
+
+
+def requirementName(line: str) -> str:
+    return re.split(r"[\s<>=!~;\[@]", line, maxsplit=1)[0].lower().replace("_", "-")
+
+#
+# @brief     readRequirements
+# @details   Requirement lines keyed by normalized package name, or None when the file uses
+#            pip options (-r, --index-url, ...) and can only be installed as a whole
+#
+def readRequirements(requirementsPath: str) -> Optional[Dict[str, str]]:
+    requirements = {}
+    with open(requirementsPath, "r") as requirementsFd:
+        for line in requirementsFd:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            if line.startswith("-"):
+                return None
+            requirements[requirementName(line)] = line
+    return requirements
+
+#
+# @brief     venvFingerprint
+# @details   Interpreter and pip version of the venv and the hash of the requirements file,
+#            read from disk without starting the interpreter
+#
+def venvFingerprint(venvPath: str, requirementsPath: str) -> Dict[str, str]:
+    pythonVersion = ""
+    cfgPath = os.path.join(venvPath, "pyvenv.cfg")
+    if os.path.exists(cfgPath):
+        with open(cfgPath, "r") as cfgFd:
+            for line in cfgFd:
+                key, _, value = line.partition("=")
+                if key.strip() in ("version", "version_info"):
+                    pythonVersion = value.strip()
+
+    pipVersions = [os.path.basename(path)[len("pip-"):-len(".dist-info")]
+                   for path in glob.glob(os.path.join(venvPath, "[Ll]ib", "**", "site-packages", "pip-*.dist-info"),
+                                         recursive=True)]
+    with open(requirementsPath, "rb") as requirementsFd:
+        requirementsHash = hashlib.sha256(requirementsFd.read().replace(b"\r\n", b"\n")).hexdigest()
+    return {"python": pythonVersion, "pip": ",".join(sorted(pipVersions)), "requirements": requirementsHash}
+
+
+def readStamp(venvPath: str) -> dict:
+    try:
+        with open(os.path.join(venvPath, STAMP_NAME), "r") as stampFd:
+            return json.load(stampFd)
+    except (OSError, ValueError):
+        return {}
+
+
+def writeStamp(venvPath: str, fingerprint: Dict[str, str], requirements: Optional[Dict[str, str]]) -> None:
+    stamp = dict(fingerprint, packages=requirements or {}, provisioned=time.time())
+    with open(os.path.join(venvPath, STAMP_NAME), "w") as stampFd:
+        json.dump(stamp, stampFd, indent=1, sort_keys=True)
+
+
+def runPip(venvPath: str, args: List[str]) -> None:
+    setupTrace.run([venvPython(venvPath), "-m", "pip"] + args, check=True)
+
+#
+# @brief     ensureWheelhouse
+# @details   Build wheels for every requirement into wheelhouse unless it already has them.
+#            Returns the pip options installing from it without the index.
+#
+def ensureWheelhouse(venvPath: str, wheelhouse: str, requirementsPath: str, fingerprint: Dict[str, str]) -> List[str]:
+    marker = os.path.join(wheelhouse, f".requirements-{fingerprint['requirements']}-py{fingerprint['python']}")
+    with FileLock(os.path.join(wheelhouse, ".wheelhouse.lock")):
+        if not os.path.exists(marker):
+            print(f"Filling the wheelhouse {wheelhouse} ...")
+            runPip(venvPath, ["wheel", "--quiet", "-r", requirementsPath, "-w", wheelhouse])
+            open(marker, "w").close()
+    return ["--no-index", "--find-links", wheelhouse]
+
+#
+# @brief     ProvisionVirtualEnv
+# @details   Install the requirements into venvPath only when something changed:
+#            - stamp matches (same requirements, interpreter and pip): nothing runs
+#            - same interpreter and pip, some requirement lines changed: only those are installed
+#            - otherwise: pip is upgraded and the full requirements file installed
+#            Returns what was done: "unchanged", "delta" or "full".
+#
+# @param venvPath         Virtual environment to provision
+# @param requirementsPath py_requirements.txt
+# @param wheelhouse       Optional local wheel directory to install from (see WHEELHOUSE_DIR)
+#
+def ProvisionVirtualEnv(venvPath: str, requirementsPath: str, wheelhouse: Optional[str] = WHEELHOUSE_DIR) -> str:
+    fingerprint = venvFingerprint(venvPath, requirementsPath)
+    stamp = readStamp(venvPath)
+    if all(stamp.get(key) == value for key, value in fingerprint.items()):
+        return "unchanged"
+
+    requirements = readRequirements(requirementsPath)
+    sameInterpreter = stamp and stamp.get("python") == fingerprint["python"] and stamp.get("pip") == fingerprint["pip"]
+    changed = None
+    if sameInterpreter and requirements is not None:
+        installed = stamp.get("packages", {})
+        changed = [line for name, line in requirements.items() if installed.get(name) != line]
+
+    indexOptions = []
+    if wheelhouse:
+        indexOptions = ensureWheelhouse(venvPath, wheelhouse, requirementsPath, fingerprint)
+
+    if changed is not None:
+        if changed:
+            print(f"Installing changed requirements: {', '.join(changed)}")
+            runPip(venvPath, ["install"] + indexOptions + changed)
+        result = "delta"
+    else:
+        if not indexOptions:
+            runPip(venvPath, ["install", "--upgrade", "pip"])
+        runPip(venvPath, ["install"] + indexOptions + ["-r", requirementsPath])
+        runPip(venvPath, ["list"])
+        # pip may have been upgraded; stamp what is there now
+        fingerprint = venvFingerprint(venvPath, requirementsPath)
+        result = "full"
+
+    writeStamp(venvPath, fingerprint, requirements)
+    sys.stdout.flush()
+    return result